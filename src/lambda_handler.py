@@ -2,26 +2,51 @@
 AWS Lambda Handler for Fuel Optimization
 Serverless entry point for the optimization system
 """
-import json
 import logging
-from typing import Dict, Any
+import os
+from typing import Dict, Any, Optional
+
+import orjson
 
 # Import our modules
 import sys
 sys.path.append('/opt')  # Lambda layer path
 
-from models import FlightPlan, Waypoint
-from weather_service import WeatherService
-from optimization_engine import FuelOptimizationEngine
-from mcp_integration import MCPIntegration
+from models import FlightPlan, Waypoint, WeatherCondition
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize services (will be reused across warm starts)
-weather_service = WeatherService()
-optimization_engine = FuelOptimizationEngine(weather_service)
-mcp_integration = MCPIntegration()
+
+def _jdumps(obj: Any) -> str:
+    """Serialize to a JSON string (orjson handles datetimes and enums natively)"""
+    return orjson.dumps(obj, option=orjson.OPT_UTC_Z).decode()
+
+
+# Services are created on first use and reused across warm starts
+_SERVICES: Dict[str, Any] = {}
+
+
+def _services() -> Dict[str, Any]:
+    """
+    Lazily import and initialize the shared services
+    
+    Keeps the service modules out of Lambda INIT so handlers that never
+    touch them (e.g. data ingestion) don't pay their import cost.
+    
+    Returns:
+        Dict with 'weather', 'opt' and 'mcp' service instances
+    """
+    if not _SERVICES:
+        from weather_service import WeatherService
+        from optimization_engine import FuelOptimizationEngine
+        from mcp_integration import MCPIntegration
+        
+        weather_service = WeatherService()
+        _SERVICES['weather'] = weather_service
+        _SERVICES['opt'] = FuelOptimizationEngine(weather_service)
+        _SERVICES['mcp'] = MCPIntegration()
+    return _SERVICES
 
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
@@ -47,24 +72,30 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         Optimization result and recommendation
     """
     try:
-        logger.info(f"Processing event: {json.dumps(event)}")
+        # Only the flight id is logged at INFO; the full payload (which can
+        # carry large waypoint lists) is encoded only when DEBUG is enabled
+        logger.info("Processing event for flight %s", event.get('flight_id'))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Event payload: %s", _jdumps(event))
+        
+        s = _services()
         
         # Parse flight plan from event
         flight_plan = parse_flight_plan(event)
         
         # Run optimization
-        optimization_result = optimization_engine.optimize_flight(flight_plan)
+        optimization_result = s['opt'].optimize_flight(flight_plan)
         
         # Create recommendation
-        recommendation = mcp_integration.create_recommendation_message(optimization_result)
+        recommendation = s['mcp'].create_recommendation_message(optimization_result)
         
         # Publish to MCP (SQS/SNS)
-        publication_result = mcp_integration.publish_to_operations(recommendation)
+        publication_result = s['mcp'].publish_to_operations(recommendation)
         
         # Return response
         response = {
             "statusCode": 200,
-            "body": json.dumps({
+            "body": _jdumps({
                 "flight_id": flight_plan.flight_id,
                 "optimization": optimization_result.dict(),
                 "recommendation": recommendation.dict(),
@@ -72,14 +103,14 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             })
         }
         
-        logger.info(f"Successfully processed flight {flight_plan.flight_id}")
+        logger.info("Successfully processed flight %s", flight_plan.flight_id)
         return response
         
     except Exception as e:
-        logger.error(f"Error processing flight: {str(e)}", exc_info=True)
+        logger.error("Error processing flight: %s", e, exc_info=True)
         return {
             "statusCode": 500,
-            "body": json.dumps({
+            "body": _jdumps({
                 "error": str(e),
                 "message": "Failed to process flight optimization"
             })
@@ -88,32 +119,37 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
 def parse_flight_plan(event: Dict[str, Any]) -> FlightPlan:
     """Parse FlightPlan from Lambda event"""
-    from datetime import datetime
-    
-    waypoints = [Waypoint(**wp) for wp in event.get('waypoints', [])]
-    
-    return FlightPlan(
-        flight_id=event['flight_id'],
-        origin=event['origin'],
-        destination=event['destination'],
-        aircraft_type=event['aircraft_type'],
-        departure_time=datetime.fromisoformat(event['departure_time']),
-        route_waypoints=waypoints,
-        planned_fuel=event.get('planned_fuel', 15000),
-        cruise_altitude=event.get('cruise_altitude', 36000),
-        passenger_count=event.get('passenger_count', 150),
-        cargo_weight=event.get('cargo_weight', 5000)
-    )
+    # Validate the whole plan in one pass; nested waypoints and the ISO
+    # departure time are handled by the model's prebuilt core schema
+    return FlightPlan.model_validate({
+        "flight_id": event['flight_id'],
+        "origin": event['origin'],
+        "destination": event['destination'],
+        "aircraft_type": event['aircraft_type'],
+        "departure_time": event['departure_time'],
+        "route_waypoints": event.get('waypoints', []),
+        "planned_fuel": event.get('planned_fuel', 15000),
+        "cruise_altitude": event.get('cruise_altitude', 36000),
+        "passenger_count": event.get('passenger_count', 150),
+        "cargo_weight": event.get('cargo_weight', 5000)
+    })
 
 
-# Handler for Step Functions state machine steps
+# Handlers for Step Functions state machine steps
+# These return plain JSON-safe dicts: they are not behind API Gateway, so
+# there is no statusCode/body envelope and the runtime encodes them once
 def data_ingestion_handler(event: Dict, context: Any) -> Dict:
     """Handler for data ingestion step"""
     logger.info("Executing data ingestion step")
+    
+    # Validate the raw event here, before any state reads its waypoints
+    flight_plan = parse_flight_plan(event)
+    data = flight_plan.model_dump(mode='json')
+    data['waypoints'] = data.pop('route_waypoints')
+    
     return {
-        "statusCode": 200,
         "step": "data_ingestion",
-        "data": event,
+        "data": data,
         "validation": "passed"
     }
 
@@ -122,27 +158,44 @@ def weather_analysis_handler(event: Dict, context: Any) -> Dict:
     """Handler for weather analysis step"""
     logger.info("Executing weather analysis step")
     
-    waypoints = [Waypoint(**wp) for wp in event.get('waypoints', [])]
-    weather_data = weather_service.fetch_weather_for_route(waypoints)
+    s = _services()
+    waypoints = [Waypoint.model_validate(wp) for wp in event.get('waypoints', [])]
+    weather_data = s['weather'].fetch_weather_for_route(waypoints)
     
     return {
-        "statusCode": 200,
         "step": "weather_analysis",
-        "weather_data": [w.dict() for w in weather_data]
+        "weather_data": [w.model_dump(mode='json') for w in weather_data]
     }
 
 
+def weather_waypoint_handler(event: Dict, context: Any) -> Optional[Dict]:
+    """Handler for one waypoint of the distributed weather analysis map"""
+    s = _services()
+    waypoint = Waypoint.model_validate(event)
+    weather = s['weather'].fetch_weather_for_waypoint(waypoint)
+    # A failed fetch becomes a null entry rather than failing the whole map
+    return weather.model_dump(mode='json') if weather is not None else None
+
+
 def optimization_compute_handler(event: Dict, context: Any) -> Dict:
     """Handler for optimization computation step"""
     logger.info("Executing optimization compute step")
     
+    s = _services()
     flight_plan = parse_flight_plan(event)
-    optimization_result = optimization_engine.optimize_flight(flight_plan)
+    
+    # Reuse the weather fetched by the WeatherAnalysis map; null entries
+    # are waypoints whose fetch failed
+    weather_data = None
+    if event.get('weather_data') is not None:
+        weather_data = [
+            WeatherCondition.model_validate(w) for w in event['weather_data'] if w is not None
+        ]
+    optimization_result = s['opt'].optimize_flight(flight_plan, weather_data)
     
     return {
-        "statusCode": 200,
         "step": "optimization_compute",
-        "result": optimization_result.dict()
+        "result": optimization_result.model_dump(mode='json')
     }
 
 
@@ -151,13 +204,14 @@ def recommendation_generation_handler(event: Dict, context: Any) -> Dict:
     logger.info("Executing recommendation generation step")
     
     from models import OptimizationResult
-    opt_result = OptimizationResult(**event['result'])
-    recommendation = mcp_integration.create_recommendation_message(opt_result)
+    s = _services()
+    # Produced by optimization_compute_handler, so already validated
+    opt_result = OptimizationResult.model_construct(**event['result'])
+    recommendation = s['mcp'].create_recommendation_message(opt_result)
     
     return {
-        "statusCode": 200,
         "step": "recommendation_generation",
-        "recommendation": recommendation.dict()
+        "recommendation": recommendation.model_dump(mode='json')
     }
 
 
@@ -166,11 +220,74 @@ def results_publication_handler(event: Dict, context: Any) -> Dict:
     logger.info("Executing results publication step")
     
     from models import OptimizationRecommendation
+    s = _services()
     recommendation = OptimizationRecommendation(**event['recommendation'])
-    publication_result = mcp_integration.publish_to_operations(recommendation)
+    publication_result = s['mcp'].publish_to_operations(recommendation)
     
     return {
-        "statusCode": 200,
         "step": "results_publication",
         "publication": publication_result
     }
+
+
+# Minimal valid payloads used to exercise validation during INIT
+_WARMUP_EVENT = {
+    "flight_id": "WARMUP",
+    "origin": "JFK",
+    "destination": "LAX",
+    "aircraft_type": "B737-800",
+    "departure_time": "2025-01-01T00:00:00",
+    "waypoints": [
+        {"name": "JFK", "latitude": 40.64, "longitude": -73.78},
+        {"name": "LAX", "latitude": 33.94, "longitude": -118.41}
+    ]
+}
+_WARMUP_RESULT = {
+    "flight_id": "WARMUP",
+    "original_fuel": 0.0,
+    "optimized_fuel": 0.0,
+    "fuel_savings": 0.0,
+    "savings_percentage": 0.0,
+    "time_impact": 0,
+    "confidence_score": 0.0,
+    "recommendation_type": "route_modification",
+    "rationale": ""
+}
+
+
+def _prime() -> None:
+    """
+    Do first-call work during Lambda INIT
+    
+    Runs one validation and dump per model so the first invocation doesn't
+    pay for it. Under SnapStart or provisioned concurrency, INIT is not on
+    the request path (the post-INIT snapshot is reused), so the services
+    are created and exercised here as well instead of lazily.
+    """
+    from models import OptimizationResult, OptimizationRecommendation
+    
+    flight_plan = parse_flight_plan(_WARMUP_EVENT)
+    result = OptimizationResult.model_validate(_WARMUP_RESULT)
+    recommendation = OptimizationRecommendation.model_validate({
+        "flight_id": result.flight_id,
+        "recommendation_type": result.recommendation_type,
+        "priority": "low",
+        "action_required": "",
+        "expected_fuel_savings": 0.0,
+        "expected_cost_savings": 0.0,
+        "time_impact": 0,
+        "confidence_level": 0.0,
+        "weather_considerations": [],
+        "implementation_steps": []
+    })
+    _jdumps([flight_plan.model_dump(), result.model_dump(), recommendation.model_dump()])
+    
+    if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") in ("snap-start", "provisioned-concurrency"):
+        s = _services()
+        # One pass through weather generation and optimization so their
+        # lazy setup also lands in the pre-initialized environment
+        s['weather'].warmup()
+        s['opt'].optimize_flight(flight_plan)
+
+
+_prime()
@@ -4,12 +4,15 @@ Orchestrates the complete optimization workflow
 """
 import json
 import logging
-import csv
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List
+from typing import Any, List, Optional, Tuple
 
-from models import FlightPlan, Waypoint
+import pandas as pd
+import orjson
+
+from models import FlightPlan, OptimizationRecommendation, OptimizationResult
 from weather_service import WeatherService
 from optimization_engine import FuelOptimizationEngine
 from strands_orchestrator import StrandsOrchestrator, WorkflowState
@@ -22,6 +25,19 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Column types for the flight CSV, parsed in C by pandas
+FLIGHT_CSV_DTYPES = {
+    # Text columns stay strings even when every value looks numeric
+    'flight_id': 'string',
+    'origin': 'string',
+    'destination': 'string',
+    'aircraft_type': 'string',
+    'planned_fuel': 'float64',
+    'cruise_altitude': 'int32',
+    'passenger_count': 'int32',
+    'cargo_weight': 'int32'
+}
+
 
 class FuelOptimizationAgent:
     """Main application class for fuel optimization"""
@@ -38,12 +54,11 @@ class FuelOptimizationAgent:
         # Initialize components
         self.weather_service = WeatherService()
         self.optimization_engine = FuelOptimizationEngine(self.weather_service)
-        self.orchestrator = StrandsOrchestrator()
         self.mcp_integration = MCPIntegration()
         
         logger.info("Fuel Optimization Agent initialized")
     
-    def load_flight_data(self, csv_file: str = "sample_flights.csv") -> List[dict]:
+    def load_flight_data(self, csv_file: str = "sample_flights.csv") -> pd.DataFrame:
         """
         Load flight data from CSV file
         
@@ -51,17 +66,17 @@ class FuelOptimizationAgent:
             csv_file: CSV filename
             
         Returns:
-            List of flight data dictionaries
+            DataFrame of flights with typed numeric and datetime columns
         """
-        flights = []
         csv_path = self.data_dir / csv_file
         
         logger.info(f"Loading flight data from {csv_path}")
         
-        with open(csv_path, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                flights.append(row)
+        flights = pd.read_csv(
+            csv_path,
+            dtype=FLIGHT_CSV_DTYPES,
+            parse_dates=['departure_time']
+        )
         
         logger.info(f"Loaded {len(flights)} flights")
         return flights
@@ -86,37 +101,33 @@ class FuelOptimizationAgent:
         logger.info(f"Loaded routes for {len(routes)} flights")
         return routes
     
-    def create_flight_plan(self, flight_data: dict, route_data: dict) -> FlightPlan:
+    def create_flight_plan(self, flight_data: Any, route_data: dict) -> FlightPlan:
         """
         Create FlightPlan object from raw data
         
         Args:
-            flight_data: Flight information from CSV
+            flight_data: Flight row from load_flight_data (itertuples)
             route_data: Route waypoints data
             
         Returns:
             FlightPlan object
         """
-        flight_id = flight_data['flight_id']
-        
-        # Get route waypoints
-        route_waypoints = [
-            Waypoint(**wp) for wp in route_data.get(flight_id, {}).get('route', [])
-        ]
-        
-        # Create flight plan
-        return FlightPlan(
-            flight_id=flight_id,
-            origin=flight_data['origin'],
-            destination=flight_data['destination'],
-            aircraft_type=flight_data['aircraft_type'],
-            departure_time=datetime.fromisoformat(flight_data['departure_time']),
-            route_waypoints=route_waypoints,
-            planned_fuel=float(flight_data['planned_fuel']),
-            cruise_altitude=int(flight_data['cruise_altitude']),
-            passenger_count=int(flight_data['passenger_count']),
-            cargo_weight=int(flight_data['cargo_weight'])
-        )
+        flight_id = flight_data.flight_id
+        
+        # Validate the whole plan in one pass; nested waypoints are handled
+        # by the model's prebuilt core schema
+        return FlightPlan.model_validate({
+            "flight_id": flight_id,
+            "origin": flight_data.origin,
+            "destination": flight_data.destination,
+            "aircraft_type": flight_data.aircraft_type,
+            "departure_time": flight_data.departure_time.to_pydatetime(),
+            "route_waypoints": route_data.get(flight_id, {}).get('route', []),
+            "planned_fuel": flight_data.planned_fuel,
+            "cruise_altitude": flight_data.cruise_altitude,
+            "passenger_count": flight_data.passenger_count,
+            "cargo_weight": flight_data.cargo_weight
+        })
     
     def process_single_flight(self, flight_plan: FlightPlan) -> dict:
         """
@@ -128,60 +139,114 @@ class FuelOptimizationAgent:
         Returns:
             Complete optimization results
         """
+        return self._run_workflow(flight_plan, publish=True)[0]
+    
+    def _run_workflow(
+        self,
+        flight_plan: FlightPlan,
+        publish: bool,
+        optimization_result: Optional[OptimizationResult] = None
+    ) -> Tuple[dict, OptimizationRecommendation]:
+        """
+        Run the optimization workflow for one flight
+        
+        Args:
+            flight_plan: Flight plan to optimize
+            publish: Publish the recommendation now; batch runs pass False
+                and publish all recommendations together afterwards
+            optimization_result: Result already computed by a batch
+                optimization; the flight is optimized here when omitted
+            
+        Returns:
+            Tuple of (complete optimization results, recommendation model)
+        """
         logger.info(f"Processing flight {flight_plan.flight_id}")
         
-        # Reset orchestrator
-        self.orchestrator.reset_workflow()
+        # Each flight gets its own orchestrator so flights can run concurrently
+        orchestrator = StrandsOrchestrator()
         
         # Step 1: Data Ingestion
-        workflow_data = {"flight_plan": flight_plan.dict()}
-        result = self.orchestrator.execute_workflow_step(
+        # The orchestrator only passes step data through, so models are
+        # handed over as-is; the returned results are the only dumps
+        workflow_data = {"flight_plan": flight_plan}
+        result = orchestrator.execute_workflow_step(
             WorkflowState.DATA_INGESTION,
             workflow_data
         )
         
         # Step 2: Weather Analysis
         weather_data = self.weather_service.fetch_weather_for_route(flight_plan.route_waypoints)
-        workflow_data["weather_data"] = [w.dict() for w in weather_data]
-        result = self.orchestrator.execute_workflow_step(
+        workflow_data["weather_data"] = weather_data
+        result = orchestrator.execute_workflow_step(
             WorkflowState.WEATHER_ANALYSIS,
             workflow_data
         )
         
         # Step 3: Optimization Compute
-        optimization_result = self.optimization_engine.optimize_flight(flight_plan)
-        workflow_data["optimization_result"] = optimization_result.dict()
-        result = self.orchestrator.execute_workflow_step(
+        if optimization_result is None:
+            optimization_result = self.optimization_engine.optimize_flight(flight_plan, weather_data)
+        workflow_data["optimization_result"] = optimization_result
+        result = orchestrator.execute_workflow_step(
             WorkflowState.OPTIMIZATION_COMPUTE,
             workflow_data
         )
         
         # Step 4: Recommendation Generation
         recommendation = self.mcp_integration.create_recommendation_message(optimization_result)
-        workflow_data["recommendations"] = recommendation.dict()
-        result = self.orchestrator.execute_workflow_step(
+        workflow_data["recommendations"] = recommendation
+        result = orchestrator.execute_workflow_step(
             WorkflowState.RECOMMENDATION_GENERATION,
             workflow_data
         )
         
         # Step 5: Results Publication
-        publication_result = self.mcp_integration.publish_to_operations(recommendation)
+        if publish:
+            publication_result = self.mcp_integration.publish_to_operations(recommendation)
+        else:
+            publication_result = {"status": "deferred"}
         workflow_data["publication"] = publication_result
-        result = self.orchestrator.execute_workflow_step(
+        result = orchestrator.execute_workflow_step(
             WorkflowState.RESULTS_PUBLICATION,
             workflow_data
         )
         
         # Get workflow status
-        workflow_status = self.orchestrator.get_workflow_status()
+        workflow_status = orchestrator.get_workflow_status()
         
         return {
             "flight_id": flight_plan.flight_id,
-            "optimization_result": optimization_result.dict(),
-            "recommendation": recommendation.dict(),
+            "optimization_result": optimization_result.model_dump(mode='json'),
+            "recommendation": recommendation.model_dump(mode='json'),
             "publication": publication_result,
             "workflow_status": workflow_status
-        }
+        }, recommendation
+    
+    def _optimize_plans(self, flight_plans: List[FlightPlan]) -> List[Optional[OptimizationResult]]:
+        """
+        Optimize flight plans in one vectorized batch
+        
+        If the batch fails, each flight is optimized on its own so a single
+        bad flight doesn't take the others down with it.
+        
+        Args:
+            flight_plans: Flight plans to optimize
+            
+        Returns:
+            Optimization results in the same order, None for failed flights
+        """
+        try:
+            return self.optimization_engine.optimize_flights(flight_plans)
+        except Exception as e:
+            logger.warning(f"Batch optimization failed, optimizing flights individually: {e}")
+        
+        optimization_results = []
+        for flight_plan in flight_plans:
+            try:
+                optimization_results.append(self.optimization_engine.optimize_flight(flight_plan))
+            except Exception as e:
+                logger.error(f"Error processing flight {flight_plan.flight_id}: {e}")
+                optimization_results.append(None)
+        return optimization_results
     
     def generate_report(self, results: List[dict], output_file: str = "optimization_report.json"):
         """
@@ -192,7 +257,7 @@ class FuelOptimizationAgent:
             output_file: Output filename
         """
         report = {
-            "generated_at": datetime.utcnow().isoformat(),
+            "generated_at": datetime.now(timezone.utc).isoformat(),
             "total_flights": len(results),
             "summary": self._generate_summary(results),
             "flights": results
@@ -200,40 +265,52 @@ class FuelOptimizationAgent:
         
         output_path = self.data_dir.parent / output_file
         
-        with open(output_path, 'w') as f:
-            json.dump(report, f, indent=2)
+        # Stream flights one at a time so the full report is never held
+        # as a single encoded buffer alongside the results list
+        header = orjson.dumps({k: v for k, v in report.items() if k != "flights"})
+        with open(output_path, 'wb') as f:
+            f.write(header[:-1] + b',"flights":[')
+            for i, result in enumerate(results):
+                if i:
+                    f.write(b',')
+                f.write(orjson.dumps(result))
+            f.write(b']}')
         
         logger.info(f"Report generated: {output_path}")
         return report
     
     def _generate_summary(self, results: List[dict]) -> dict:
         """Generate summary statistics from results"""
-        total_fuel_savings = sum(
-            r['optimization_result']['fuel_savings'] for r in results
-        )
-        total_cost_savings = sum(
-            r['optimization_result']['cost_savings'] for r in results
-        )
-        avg_confidence = sum(
-            r['optimization_result']['confidence_score'] for r in results
-        ) / len(results)
+        n = len(results)
         
-        high_priority = sum(
-            1 for r in results if r['recommendation']['priority'] == 'high'
-        )
+        # One fused pass over results accumulating every metric
+        total_fuel_savings = total_cost_savings = total_confidence = 0.0
+        high_priority = 0
+        for r in results:
+            opt = r['optimization_result']
+            total_fuel_savings += opt['fuel_savings']
+            total_cost_savings += opt['cost_savings']
+            total_confidence += opt['confidence_score']
+            if r['recommendation']['priority'] == 'high':
+                high_priority += 1
+        
+        avg_confidence = total_confidence / n if n else 0.0
         
         return {
             "total_fuel_savings_kg": round(total_fuel_savings, 1),
             "total_cost_savings_usd": round(total_cost_savings, 2),
             "average_confidence": round(avg_confidence, 3),
             "high_priority_recommendations": high_priority,
-            "optimization_rate": f"{(len(results) / len(results)) * 100:.0f}%"
+            "optimization_rate": f"{100 if n else 0}%"
         }
     
-    def run_batch_optimization(self):
+    def run_batch_optimization(self, max_workers: int = 16):
         """
         Run optimization for all flights in the data directory
         
+        Args:
+            max_workers: Number of flights processed concurrently
+        
         Returns:
             Optimization report
         """
@@ -243,24 +320,56 @@ class FuelOptimizationAgent:
         flights = self.load_flight_data()
         routes = self.load_route_waypoints()
         
-        # Process each flight
-        results = []
-        for flight_data in flights:
+        flight_plans = []
+        planned_flights = []
+        for flight_data in flights.itertuples(index=False):
             try:
-                flight_plan = self.create_flight_plan(flight_data, routes)
-                result = self.process_single_flight(flight_plan)
-                results.append(result)
-                
-                # Print summary
-                opt_result = result['optimization_result']
-                print(f"\n✈️  {flight_plan.flight_id}: {flight_plan.origin} → {flight_plan.destination}")
-                print(f"   Fuel Savings: {opt_result['fuel_savings']:.1f} kg ({opt_result['savings_percentage']:.1f}%)")
-                print(f"   Cost Savings: ${opt_result['cost_savings']:.2f}")
-                print(f"   Recommendation: {opt_result['recommendation_type']}")
-                print(f"   Confidence: {opt_result['confidence_score'] * 100:.0f}%")
-                
+                flight_plans.append(self.create_flight_plan(flight_data, routes))
+                planned_flights.append(flight_data)
             except Exception as e:
-                logger.error(f"Error processing flight {flight_data['flight_id']}: {e}")
+                logger.error(f"Error processing flight {flight_data.flight_id}: {e}")
+        
+        optimization_results = self._optimize_plans(flight_plans)
+        
+        # Flights are independent, so overlap the remaining workflow steps;
+        # results are still collected in input order
+        results = []
+        recommendations = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                (flight_data, executor.submit(
+                    self._run_workflow, flight_plan, False, optimization_result
+                ))
+                for flight_data, flight_plan, optimization_result in zip(
+                    planned_flights, flight_plans, optimization_results
+                )
+                if optimization_result is not None
+            ]
+            
+            for flight_data, future in futures:
+                try:
+                    result, recommendation = future.result()
+                    results.append(result)
+                    recommendations.append(recommendation)
+                    
+                    # Print summary
+                    opt_result = result['optimization_result']
+                    # One write per flight rather than one per line
+                    print(
+                        f"\n✈️  {flight_data.flight_id}: {flight_data.origin} → {flight_data.destination}\n"
+                        f"   Fuel Savings: {opt_result['fuel_savings']:.1f} kg ({opt_result['savings_percentage']:.1f}%)\n"
+                        f"   Cost Savings: ${opt_result['cost_savings']:.2f}\n"
+                        f"   Recommendation: {opt_result['recommendation_type']}\n"
+                        f"   Confidence: {opt_result['confidence_score'] * 100:.0f}%"
+                    )
+                    
+                except Exception as e:
+                    logger.error(f"Error processing flight {flight_data.flight_id}: {e}")
+        
+        # Publish all recommendations in SQS-sized batches
+        publications = self.mcp_integration.publish_many(recommendations)
+        for result, publication in zip(results, publications):
+            result['publication'] = publication
         
         # Generate report
         report = self.generate_report(results)
@@ -2,15 +2,62 @@
 MCP (Model Context Protocol) Integration
 Handles communication with airline operational systems
 """
-import json
 import logging
 import uuid
-from typing import Dict, Any, Optional
-from datetime import datetime
-from models import MCPMessage, OptimizationRecommendation, OptimizationResult
+from collections import deque
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timezone
+
+import orjson
+
+from models import (
+    MCPMessage, OptimizationRecommendation, OptimizationResult, RecommendationType
+)
 
 logger = logging.getLogger(__name__)
 
+# MCP message priority (1-10) for each recommendation priority; the
+# priorities are lowercase, as OptimizationRecommendation normalizes them
+_PRIORITY_MAP = {
+    "low": 3,
+    "medium": 6,
+    "high": 9
+}
+
+_NL = "\n"
+
+# Email body for MCPMessageFormatter.format_for_email
+_EMAIL_TEMPLATE = """
+FUEL OPTIMIZATION RECOMMENDATION
+==================================================
+
+Flight: {flight_id}
+Priority: {priority}
+Generated: {generated}
+
+RECOMMENDATION
+--------------
+Type: {rec_type}
+Action Required: {action}
+
+EXPECTED BENEFITS
+-----------------
+Fuel Savings: {fuel:.1f} kg
+Cost Savings: ${cost:.2f} USD
+Time Impact: {time_impact:+d} minutes
+Confidence: {confidence:.0f}%
+
+WEATHER CONSIDERATIONS
+----------------------
+{weather}
+
+IMPLEMENTATION STEPS
+--------------------
+{steps}
+
+This is an automated recommendation. Please coordinate with dispatch before implementation.
+"""
+
 
 class MCPIntegration:
     """
@@ -18,6 +65,45 @@ class MCPIntegration:
     Publishes recommendations to operational systems via message queues
     """
     
+    # Maximum number of entries SQS accepts in one SendMessageBatch call
+    SQS_BATCH_SIZE = 10
+    
+    # Most recent publications kept in memory (bounded for warm starts)
+    MESSAGE_HISTORY_LIMIT = 10_000
+    
+    # Implementation step templates per recommendation type ({fl} = flight level)
+    _STEP_TEMPLATES = {
+        RecommendationType.ALTITUDE_OPTIMIZATION: (
+            "1. Review current flight plan and fuel calculations",
+            "2. Request altitude change to FL{fl} from ATC",
+            "3. Update FMS with new cruise altitude",
+            "4. Monitor fuel consumption after altitude change",
+            "5. Report actual savings to operations"
+        ),
+        RecommendationType.ROUTE_MODIFICATION: (
+            "1. Review proposed route modifications",
+            "2. Verify route changes with dispatch",
+            "3. Submit route amendment request to ATC",
+            "4. Update FMS with new waypoints",
+            "5. Monitor progress and fuel consumption"
+        )
+    }
+    _DEFAULT_STEPS = (
+        "1. Review optimization recommendation",
+        "2. Coordinate with dispatch and ATC",
+        "3. Implement approved changes",
+        "4. Monitor and report results"
+    )
+    
+    # Action required templates per recommendation type
+    _ACTION_TEMPLATES = {
+        RecommendationType.ALTITUDE_OPTIMIZATION:
+            "Request altitude change to FL{fl} for {savings:.0f}kg fuel savings",
+        RecommendationType.ROUTE_MODIFICATION:
+            "Review route modifications for {savings:.0f}kg fuel savings"
+    }
+    _DEFAULT_ACTION = "Implement optimization for {savings:.0f}kg fuel savings"
+    
     def __init__(self, queue_url: Optional[str] = None, sns_topic_arn: Optional[str] = None):
         """
         Initialize MCP integration
@@ -28,7 +114,7 @@ class MCPIntegration:
         """
         self.queue_url = queue_url or "mock-queue-url"
         self.sns_topic_arn = sns_topic_arn or "mock-sns-topic"
-        self.message_history = []
+        self.message_history: deque = deque(maxlen=self.MESSAGE_HISTORY_LIMIT)
         
     def create_recommendation_message(
         self,
@@ -83,32 +169,126 @@ class MCPIntegration:
         Returns:
             Publication result
         """
+        # One clock read per publish, shared by the message, result and history
+        now = datetime.now(timezone.utc)
+        
         # Create MCP message
-        mcp_message = MCPMessage(
-            message_id=str(uuid.uuid4()),
-            message_type="fuel_optimization_recommendation",
-            flight_id=recommendation.flight_id,
-            payload=recommendation.dict(),
-            priority=self._priority_to_int(recommendation.priority),
-            requires_acknowledgment=True
-        )
+        mcp_message = self._build_message(recommendation, now)
         
-        logger.info(f"Publishing MCP message {mcp_message.message_id} for flight {recommendation.flight_id}")
+        logger.info(
+            "Publishing MCP message %s for flight %s",
+            mcp_message.message_id, recommendation.flight_id
+        )
         
         # In production, this would publish to SQS/SNS
         # For demo, we'll simulate the publication
-        result = self._simulate_publish(mcp_message)
+        self._simulate_publish(mcp_message)
+        
+        return self._record_publication(mcp_message, recommendation, "published", now.isoformat())
+    
+    def publish_many(
+        self,
+        recommendations: List[OptimizationRecommendation]
+    ) -> List[Dict[str, Any]]:
+        """
+        Publish recommendations to operations in SQS-sized batches
+        
+        Args:
+            recommendations: Optimization recommendations
+            
+        Returns:
+            Publication results, one per recommendation in input order
+        """
+        results = []
+        
+        for start in range(0, len(recommendations), self.SQS_BATCH_SIZE):
+            chunk = recommendations[start:start + self.SQS_BATCH_SIZE]
+            now = datetime.now(timezone.utc)
+            now_iso = now.isoformat()
+            
+            messages = [self._build_message(recommendation, now) for recommendation in chunk]
+            
+            # Entry ids only need to be unique within one batch request
+            entries = [
+                {
+                    "Id": str(i),
+                    "MessageBody": orjson.dumps(message).decode(),
+                    "MessageAttributes": {
+                        "Priority": {
+                            "DataType": "Number",
+                            "StringValue": str(message.priority)
+                        },
+                        "FlightId": {
+                            "DataType": "String",
+                            "StringValue": message.flight_id
+                        }
+                    }
+                }
+                for i, message in enumerate(messages)
+            ]
+            
+            logger.info("Publishing batch of %d MCP messages", len(entries))
+            
+            # In production, this would be one boto3 SQS send_message_batch call
+            # For demo, we'll simulate the batch publication
+            response = self._simulate_publish_batch(entries)
+            published = {entry["Id"] for entry in response["Successful"]}
+            
+            for i, (message, recommendation) in enumerate(zip(messages, chunk)):
+                status = "published" if str(i) in published else "failed"
+                results.append(self._record_publication(message, recommendation, status, now_iso))
+        
+        return results
+    
+    def _build_message(
+        self,
+        recommendation: OptimizationRecommendation,
+        timestamp: datetime
+    ) -> MCPMessage:
+        """Wrap a recommendation in an MCP message"""
+        return MCPMessage(
+            message_id=uuid.uuid4().hex,
+            message_type="fuel_optimization_recommendation",
+            flight_id=recommendation.flight_id,
+            timestamp=timestamp,
+            payload=recommendation.model_dump(),
+            priority=_PRIORITY_MAP.get(recommendation.priority, 5),
+            requires_acknowledgment=True
+        )
+    
+    def _record_publication(
+        self,
+        message: MCPMessage,
+        recommendation: OptimizationRecommendation,
+        status: str,
+        timestamp: str
+    ) -> Dict[str, Any]:
+        """
+        Build the publication result for a message and store it in history
         
-        # Store in history
+        Args:
+            message: Published MCP message
+            recommendation: Recommendation carried by the message
+            status: "published" or "failed"
+            timestamp: ISO publication time
+            
+        Returns:
+            Publication result
+        """
         self.message_history.append({
-            "message_id": mcp_message.message_id,
+            "message_id": message.message_id,
             "flight_id": recommendation.flight_id,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": timestamp,
             "priority": recommendation.priority,
-            "status": result["status"]
+            "status": status
         })
-        
-        return result
+        return {
+            "status": status,
+            "message_id": message.message_id,
+            "queue_url": self.queue_url,
+            "timestamp": timestamp,
+            "receipt_handle": f"mock-receipt-{message.message_id[:8]}"
+        }
     
     def _simulate_publish(self, message: MCPMessage) -> Dict[str, Any]:
         """
@@ -119,68 +299,43 @@ class MCPIntegration:
             message: MCP message to publish
             
         Returns:
-            Publication result
+            SQS SendMessage-shaped response
         """
-        # Simulated AWS SQS/SNS response
-        return {
-            "status": "published",
-            "message_id": message.message_id,
-            "queue_url": self.queue_url,
-            "timestamp": datetime.utcnow().isoformat(),
-            "receipt_handle": f"mock-receipt-{message.message_id[:8]}"
-        }
+        return {"MessageId": uuid.uuid4().hex}
     
     def _generate_implementation_steps(self, result: OptimizationResult) -> list:
         """Generate implementation steps based on recommendation type"""
-        steps = []
-        
-        if result.recommendation_type.value == "altitude_optimization":
-            steps = [
-                "1. Review current flight plan and fuel calculations",
-                f"2. Request altitude change to FL{result.optimized_altitude // 100} from ATC",
-                "3. Update FMS with new cruise altitude",
-                "4. Monitor fuel consumption after altitude change",
-                "5. Report actual savings to operations"
-            ]
-        elif result.recommendation_type.value == "route_modification":
-            steps = [
-                "1. Review proposed route modifications",
-                "2. Verify route changes with dispatch",
-                "3. Submit route amendment request to ATC",
-                "4. Update FMS with new waypoints",
-                "5. Monitor progress and fuel consumption"
-            ]
-        else:
-            steps = [
-                "1. Review optimization recommendation",
-                "2. Coordinate with dispatch and ATC",
-                "3. Implement approved changes",
-                "4. Monitor and report results"
-            ]
-        
-        return steps
+        steps = self._STEP_TEMPLATES.get(result.recommendation_type, self._DEFAULT_STEPS)
+        flight_level = result.optimized_altitude // 100 if result.optimized_altitude else 0
+        return [step.format(fl=flight_level) for step in steps]
     
     def _format_action_required(self, result: OptimizationResult) -> str:
         """Format action required text"""
-        if result.recommendation_type.value == "altitude_optimization":
-            return f"Request altitude change to FL{result.optimized_altitude // 100} for {result.fuel_savings:.0f}kg fuel savings"
-        elif result.recommendation_type.value == "route_modification":
-            return f"Review route modifications for {result.fuel_savings:.0f}kg fuel savings"
-        else:
-            return f"Implement optimization for {result.fuel_savings:.0f}kg fuel savings"
-    
-    def _priority_to_int(self, priority: str) -> int:
-        """Convert priority string to integer"""
-        priority_map = {
-            "low": 3,
-            "medium": 6,
-            "high": 9
+        template = self._ACTION_TEMPLATES.get(result.recommendation_type, self._DEFAULT_ACTION)
+        flight_level = result.optimized_altitude // 100 if result.optimized_altitude else 0
+        return template.format(fl=flight_level, savings=result.fuel_savings)
+    
+    def _simulate_publish_batch(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Simulate an SQS SendMessageBatch call (for demo purposes)
+        
+        Args:
+            entries: SendMessageBatch request entries
+            
+        Returns:
+            SendMessageBatch-shaped response
+        """
+        return {
+            "Successful": [
+                {"Id": entry["Id"], "MessageId": uuid.uuid4().hex}
+                for entry in entries
+            ],
+            "Failed": []
         }
-        return priority_map.get(priority.lower(), 5)
     
     def get_message_history(self) -> list:
-        """Get publication history"""
-        return self.message_history
+        """Get publication history (most recent MESSAGE_HISTORY_LIMIT entries)"""
+        return list(self.message_history)
     
     def acknowledge_message(self, message_id: str) -> Dict[str, Any]:
         """
@@ -195,7 +350,7 @@ class MCPIntegration:
         return {
             "status": "acknowledged",
             "message_id": message_id,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": datetime.now(timezone.utc).isoformat()
         }
 
 
@@ -222,34 +377,20 @@ class MCPMessageFormatter:
     @staticmethod
     def format_for_email(recommendation: OptimizationRecommendation) -> str:
         """Format recommendation as email text"""
-        email_template = f"""
-FUEL OPTIMIZATION RECOMMENDATION
-{'=' * 50}
-
-Flight: {recommendation.flight_id}
-Priority: {recommendation.priority.upper()}
-Generated: {recommendation.generated_at.strftime('%Y-%m-%d %H:%M UTC')}
-
-RECOMMENDATION
---------------
-Type: {recommendation.recommendation_type.value.replace('_', ' ').title()}
-Action Required: {recommendation.action_required}
-
-EXPECTED BENEFITS
------------------
-Fuel Savings: {recommendation.expected_fuel_savings:.1f} kg
-Cost Savings: ${recommendation.expected_cost_savings:.2f} USD
-Time Impact: {recommendation.time_impact:+d} minutes
-Confidence: {recommendation.confidence_level * 100:.0f}%
-
-WEATHER CONSIDERATIONS
-----------------------
-{chr(10).join('- ' + factor for factor in recommendation.weather_considerations) if recommendation.weather_considerations else '- None'}
-
-IMPLEMENTATION STEPS
---------------------
-{chr(10).join(recommendation.implementation_steps)}
-
-This is an automated recommendation. Please coordinate with dispatch before implementation.
-"""
-        return email_template
+        weather = _NL.join(
+            '- ' + factor for factor in recommendation.weather_considerations
+        ) or '- None'
+        
+        return _EMAIL_TEMPLATE.format(
+            flight_id=recommendation.flight_id,
+            priority=recommendation.priority.upper(),
+            generated=recommendation.generated_at.strftime('%Y-%m-%d %H:%M UTC'),
+            rec_type=recommendation.recommendation_type.value.replace('_', ' ').title(),
+            action=recommendation.action_required,
+            fuel=recommendation.expected_fuel_savings,
+            cost=recommendation.expected_cost_savings,
+            time_impact=recommendation.time_impact,
+            confidence=recommendation.confidence_level * 100,
+            weather=weather,
+            steps=_NL.join(recommendation.implementation_steps)
+        )
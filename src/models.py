@@ -1,11 +1,15 @@
 """
 Data models for the Airline Fuel Optimization Agent
 """
-from typing import List, Optional, Dict
-from pydantic import BaseModel, Field
-from datetime import datetime
+from typing import TYPE_CHECKING, List, Optional, Dict
+from dataclasses import dataclass, field
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from datetime import datetime, timezone
 from enum import Enum
 
+if TYPE_CHECKING:
+    from waypoint_arrays import RouteArrays
+
 
 class RecommendationType(str, Enum):
     """Types of optimization recommendations"""
@@ -17,6 +21,8 @@ class RecommendationType(str, Enum):
 
 class Waypoint(BaseModel):
     """Flight waypoint with coordinates"""
+    model_config = ConfigDict(frozen=True)
+    
     name: str
     latitude: float = Field(..., ge=-90, le=90)
     longitude: float = Field(..., ge=-180, le=180)
@@ -25,6 +31,8 @@ class Waypoint(BaseModel):
 
 class WeatherCondition(BaseModel):
     """Weather data for a specific location"""
+    model_config = ConfigDict(frozen=True)
+    
     location: str
     timestamp: datetime
     temperature: float  # Celsius
@@ -37,6 +45,8 @@ class WeatherCondition(BaseModel):
 
 class AircraftPerformance(BaseModel):
     """Aircraft performance characteristics"""
+    model_config = ConfigDict(frozen=True)
+    
     aircraft_type: str
     max_cruise_altitude: int = 41000  # feet
     optimal_cruise_altitude: int = 36000  # feet
@@ -60,10 +70,18 @@ class FlightPlan(BaseModel):
     estimated_duration: int = 300  # minutes
     passenger_count: int = 150
     cargo_weight: int = 5000  # kg
+    
+    @property
+    def route_soa(self) -> "RouteArrays":
+        """Route (latitude, longitude, altitude) arrays of the current waypoints"""
+        from waypoint_arrays import to_soa
+        return to_soa(self.route_waypoints)
 
 
 class OptimizationResult(BaseModel):
     """Result of fuel optimization analysis"""
+    model_config = ConfigDict(frozen=True)
+    
     flight_id: str
     original_fuel: float  # kg
     optimized_fuel: float  # kg
@@ -91,15 +109,22 @@ class OptimizationRecommendation(BaseModel):
     confidence_level: float
     weather_considerations: List[str]
     implementation_steps: List[str]
-    generated_at: datetime = Field(default_factory=datetime.utcnow)
-
-
-class MCPMessage(BaseModel):
-    """Message format for MCP integration"""
+    generated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    
+    @field_validator("priority", mode="before")
+    @classmethod
+    def _normalize_priority(cls, value):
+        """Accept any case from external callers; the MCP priority map is lowercase"""
+        return value.lower() if isinstance(value, str) else value
+
+
+@dataclass(slots=True, frozen=True)
+class MCPMessage:
+    """Message format for MCP integration (internal only, so not validated)"""
     message_id: str
     message_type: str
     flight_id: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
     payload: Dict
     priority: int = 5  # 1-10, 10 being highest
     requires_acknowledgment: bool = True
+    timestamp: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
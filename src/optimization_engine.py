@@ -2,23 +2,64 @@
 Fuel optimization engine - core logic for route and altitude optimization
 """
 import logging
-import math
-from typing import List, Dict, Tuple
+from itertools import product
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
 from models import (
     FlightPlan, Waypoint, WeatherCondition, OptimizationResult,
     AircraftPerformance, RecommendationType
 )
 from weather_service import WeatherService
+from waypoint_arrays import (
+    haversine_nm, to_soa, to_padded_soa, haversine_segments, route_distances
+)
 
 logger = logging.getLogger(__name__)
 
 
+def _altitude_factor(altitude, optimal_altitude):
+    """Fuel burn factor for cruising away from the optimal altitude (floats or arrays)"""
+    # Each 2000 ft deviation increases fuel burn by ~1.5%
+    return 1.0 + (abs(altitude - optimal_altitude) / 2000) * 0.015
+
+
+def fuel_kernel(distance, burn_rate, altitude_factor, weight_factor, ground_speed):
+    """
+    Core fuel arithmetic shared by the scalar and batch estimators
+    
+    Operates on floats or broadcastable NumPy arrays alike, so there is a
+    single copy of the formula.
+    
+    Args:
+        distance: Route distance in nautical miles
+        burn_rate: Base fuel burn rate (kg/h)
+        altitude_factor: Fuel burn factor for cruise altitude
+        weight_factor: Fuel burn factor for aircraft weight
+        ground_speed: Ground speed in knots
+    
+    Returns:
+        Tuple of (fuel burn rate, flight time hours, cruise fuel, reserve fuel)
+    """
+    fuel_burn_rate = burn_rate * altitude_factor * weight_factor
+    flight_time_hours = distance / ground_speed
+    cruise_fuel = fuel_burn_rate * flight_time_hours
+    
+    # Reserves: 5% contingency + 30 min holding
+    reserve_fuel = cruise_fuel * 0.05 + fuel_burn_rate * 0.5
+    return fuel_burn_rate, flight_time_hours, cruise_fuel, reserve_fuel
+
+
 class FuelOptimizationEngine:
     """Engine for calculating optimal routes and fuel consumption"""
     
     # Fuel price in USD per kg (approximate)
     FUEL_PRICE_PER_KG = 0.85
     
+    # Candidate cruise altitudes (ft)
+    ALTITUDE_OPTIONS = (32000, 34000, 36000, 38000, 40000)
+    
     # Aircraft performance database
     AIRCRAFT_DB = {
         "B737-800": AircraftPerformance(
@@ -53,6 +94,20 @@ class FuelOptimizationEngine:
         )
     }
     
+    # Flat per-type constants for the fuel hot path:
+    # (base burn rate, optimal altitude, cruise speed, 1 / empty weight)
+    _AIRCRAFT_FAST = {
+        k: (v.fuel_burn_rate_base, v.optimal_cruise_altitude, v.cruise_speed, 1.0 / v.weight_empty)
+        for k, v in AIRCRAFT_DB.items()
+    }
+    
+    # Altitude factors for every aircraft at the candidate altitudes,
+    # keyed by (optimal altitude, altitude)
+    _ALTITUDE_FACTORS = {
+        (v.optimal_cruise_altitude, alt): _altitude_factor(alt, v.optimal_cruise_altitude)
+        for v, alt in product(AIRCRAFT_DB.values(), ALTITUDE_OPTIONS)
+    }
+    
     def __init__(self, weather_service: WeatherService):
         """
         Initialize optimization engine
@@ -73,20 +128,7 @@ class FuelOptimizationEngine:
         Returns:
             Distance in nautical miles
         """
-        # Haversine formula
-        lat1, lon1 = math.radians(point1.latitude), math.radians(point1.longitude)
-        lat2, lon2 = math.radians(point2.latitude), math.radians(point2.longitude)
-        
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-        
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        
-        # Earth radius in nautical miles
-        r = 3440.065
-        
-        return c * r
+        return haversine_nm(point1.latitude, point1.longitude, point2.latitude, point2.longitude)
     
     def calculate_route_distance(self, waypoints: List[Waypoint]) -> float:
         """
@@ -98,10 +140,8 @@ class FuelOptimizationEngine:
         Returns:
             Total distance in nautical miles
         """
-        total_distance = 0
-        for i in range(len(waypoints) - 1):
-            total_distance += self.calculate_distance(waypoints[i], waypoints[i + 1])
-        return total_distance
+        lat, lon, _ = to_soa(waypoints)
+        return float(haversine_segments(lat, lon).sum())
     
     def estimate_fuel_consumption(
         self,
@@ -120,39 +160,45 @@ class FuelOptimizationEngine:
         Returns:
             Dict with fuel consumption details
         """
-        # Get aircraft performance data
-        aircraft = self.AIRCRAFT_DB.get(
-            flight_plan.aircraft_type,
-            self.AIRCRAFT_DB["B737-800"]  # Default
+        aircraft = self._get_aircraft(flight_plan)
+        return self._estimate_fuel_at_altitude(
+            aircraft,
+            self._calculate_plan_distance(flight_plan),
+            self._calculate_weight_factor(aircraft[3], flight_plan),
+            self._calculate_wind_impact(flight_plan, weather_data),
+            altitude
         )
+    
+    def _estimate_fuel_at_altitude(
+        self,
+        aircraft: Tuple[float, int, int, float],
+        distance: float,
+        weight_factor: float,
+        avg_wind_impact: float,
+        altitude: int
+    ) -> Dict:
+        """
+        Estimate fuel consumption from precomputed altitude-independent inputs
         
-        # Calculate route distance
-        distance = self.calculate_route_distance(flight_plan.route_waypoints)
-        
-        # Base fuel burn rate
-        fuel_burn_rate = aircraft.fuel_burn_rate_base
+        Args:
+            aircraft: Aircraft constants from _AIRCRAFT_FAST
+            distance: Route distance in nautical miles
+            weight_factor: Fuel burn factor for aircraft weight
+            avg_wind_impact: Average wind impact on ground speed (knots)
+            altitude: Cruise altitude
+            
+        Returns:
+            Dict with fuel consumption details
+        """
+        burn_rate, optimal_altitude, cruise_speed, _ = aircraft
         
         # Altitude adjustment (optimal altitude = 1.0, others increase fuel burn)
-        altitude_factor = self._calculate_altitude_factor(altitude, aircraft.optimal_cruise_altitude)
-        fuel_burn_rate *= altitude_factor
-        
-        # Weight adjustment (heavier = more fuel)
-        total_weight = aircraft.weight_empty + flight_plan.cargo_weight + (flight_plan.passenger_count * 90)
-        weight_factor = 1 + ((total_weight - aircraft.weight_empty) / aircraft.weight_empty) * 0.15
-        fuel_burn_rate *= weight_factor
-        
-        # Wind adjustment
-        avg_wind_impact = self._calculate_wind_impact(flight_plan, weather_data)
+        altitude_factor = self._calculate_altitude_factor(altitude, optimal_altitude)
         
-        # Calculate flight time
-        ground_speed = aircraft.cruise_speed + avg_wind_impact  # +tailwind or -headwind
-        flight_time_hours = distance / ground_speed
-        
-        # Total fuel
-        total_fuel = fuel_burn_rate * flight_time_hours
-        
-        # Add reserves (5% contingency + 30 min holding)
-        reserve_fuel = total_fuel * 0.05 + (fuel_burn_rate * 0.5)
+        ground_speed = cruise_speed + avg_wind_impact  # +tailwind or -headwind
+        fuel_burn_rate, flight_time_hours, total_fuel, reserve_fuel = fuel_kernel(
+            distance, burn_rate, altitude_factor, weight_factor, ground_speed
+        )
         total_fuel_with_reserves = total_fuel + reserve_fuel
         
         return {
@@ -168,53 +214,160 @@ class FuelOptimizationEngine:
             "ground_speed": round(ground_speed, 1)
         }
     
-    def optimize_flight(self, flight_plan: FlightPlan) -> OptimizationResult:
+    def optimize_flight(
+        self,
+        flight_plan: FlightPlan,
+        weather_data: Optional[List[WeatherCondition]] = None
+    ) -> OptimizationResult:
         """
         Perform comprehensive flight optimization
         
         Args:
             flight_plan: Original flight plan
+            weather_data: Route weather already fetched by the caller;
+                fetched here when omitted
             
         Returns:
             Optimization result with recommendations
         """
         logger.info(f"Optimizing flight {flight_plan.flight_id}")
         
-        # Fetch weather data
-        weather_data = self.weather_service.fetch_weather_for_route(flight_plan.route_waypoints)
+        if weather_data is None:
+            weather_data = self.weather_service.fetch_weather_for_route(flight_plan.route_waypoints)
+        
+        # Distance, weight and wind don't depend on altitude; compute them once
+        aircraft = self._get_aircraft(flight_plan)
+        distance = self._calculate_plan_distance(flight_plan)
+        weight_factor = self._calculate_weight_factor(aircraft[3], flight_plan)
+        avg_wind_impact, avg_wind = self._calculate_wind_stats(flight_plan, weather_data)
+        
+        def estimate(altitude: int) -> Dict:
+            return self._estimate_fuel_at_altitude(
+                aircraft, distance, weight_factor, avg_wind_impact, altitude
+            )
         
         # Calculate original fuel consumption
-        original_fuel_calc = self.estimate_fuel_consumption(
+        original_fuel_calc = estimate(flight_plan.cruise_altitude)
+        original_fuel = original_fuel_calc["total_fuel"]
+        
+        # Fuel burn grows monotonically with deviation from the optimal
+        # altitude, so the best candidate is simply the closest one; the
+        # filed altitude is kept unless a candidate is strictly closer
+        optimal = aircraft[1]
+        best_altitude = min(self.ALTITUDE_OPTIONS, key=lambda a: abs(a - optimal))
+        if abs(flight_plan.cruise_altitude - optimal) <= abs(best_altitude - optimal):
+            best_altitude = flight_plan.cruise_altitude
+        
+        # Calculate optimized fuel
+        optimized_fuel_calc = estimate(best_altitude)
+        
+        return self._build_result(
             flight_plan,
-            weather_data,
-            flight_plan.cruise_altitude
+            original_fuel,
+            best_altitude,
+            optimized_fuel_calc["total_fuel"],
+            optimized_fuel_calc["avg_wind_impact"],
+            avg_wind
         )
-        original_fuel = original_fuel_calc["total_fuel"]
+    
+    def optimize_flights(self, flight_plans: List[FlightPlan]) -> List[OptimizationResult]:
+        """
+        Optimize a batch of flights with vectorized fuel calculations
         
-        # Test alternative altitudes
-        altitude_options = [32000, 34000, 36000, 38000, 40000]
-        best_altitude = flight_plan.cruise_altitude
-        best_altitude_fuel = original_fuel
+        Distances, fuel factors and every altitude candidate are evaluated
+        for all flights at once; only weather fetching and result assembly
+        remain per flight.
         
-        for alt in altitude_options:
-            fuel_calc = self.estimate_fuel_consumption(flight_plan, weather_data, alt)
-            if fuel_calc["total_fuel"] < best_altitude_fuel:
-                best_altitude = alt
-                best_altitude_fuel = fuel_calc["total_fuel"]
+        Args:
+            flight_plans: Original flight plans
+            
+        Returns:
+            Optimization results in the same order as flight_plans
+        """
+        if not flight_plans:
+            return []
+        
+        logger.info("Optimizing %d flights", len(flight_plans))
+        
+        weather = [
+            self.weather_service.fetch_weather_for_route(fp.route_waypoints)
+            for fp in flight_plans
+        ]
+        wind_impacts, avg_winds = self._calculate_wind_stats_batch(flight_plans, weather)
+        
+        # Column 0 is the filed altitude so argmin keeps it on ties
+        altitudes = np.empty((len(flight_plans), 1 + len(self.ALTITUDE_OPTIONS)))
+        altitudes[:, 0] = [fp.cruise_altitude for fp in flight_plans]
+        altitudes[:, 1:] = self.ALTITUDE_OPTIONS
+        
+        fuel = np.round(self.estimate_fuel_matrix(flight_plans, altitudes, wind_impacts), 1)
+        best = np.argmin(fuel, axis=1)
+        rows = np.arange(len(flight_plans))
+        
+        return [
+            self._build_result(
+                fp, float(original), int(altitude), float(optimized),
+                round(float(wind), 1), float(avg_wind)
+            )
+            for fp, original, altitude, optimized, wind, avg_wind in zip(
+                flight_plans, fuel[:, 0],
+                altitudes[rows, best], fuel[rows, best], wind_impacts, avg_winds
+            )
+        ]
+    
+    def estimate_fuel_matrix(
+        self,
+        flight_plans: List[FlightPlan],
+        altitudes: np.ndarray,
+        wind_impacts: np.ndarray
+    ) -> np.ndarray:
+        """
+        Estimate total fuel (with reserves) for many flights and altitudes
         
-        # Analyze jet stream
-        jet_stream = self.weather_service.get_jet_stream_info(
-            flight_plan.route_waypoints,
-            best_altitude
+        Args:
+            flight_plans: Flight plans, one per row
+            altitudes: Candidate altitudes, shape (n_flights, n_altitudes)
+                or broadcastable to it
+            wind_impacts: Average wind impact per flight (knots)
+            
+        Returns:
+            Fuel matrix in kg, shape (n_flights, n_altitudes)
+        """
+        burn_rate, optimal, speed, inv_weight_empty = np.array(
+            [self._get_aircraft(fp) for fp in flight_plans], dtype=np.float64
+        ).T
+        payload = np.array(
+            [fp.cargo_weight + fp.passenger_count * 90 for fp in flight_plans], dtype=np.float64
         )
+        weight_factor = 1 + payload * inv_weight_empty * 0.15
         
-        # Calculate optimized fuel
-        optimized_fuel_calc = self.estimate_fuel_consumption(
-            flight_plan,
-            weather_data,
+        lat, lon = to_padded_soa([fp.route_waypoints for fp in flight_plans])
+        distance = route_distances(lat, lon)
+        
+        _, _, total_fuel, reserve_fuel = fuel_kernel(
+            distance[:, None],
+            burn_rate[:, None],
+            _altitude_factor(np.asarray(altitudes), optimal[:, None]),
+            weight_factor[:, None],
+            (speed + wind_impacts)[:, None]
+        )
+        return total_fuel + reserve_fuel
+    
+    def _build_result(
+        self,
+        flight_plan: FlightPlan,
+        original_fuel: float,
+        best_altitude: int,
+        optimized_fuel: float,
+        avg_wind_impact: float,
+        avg_wind: float
+    ) -> OptimizationResult:
+        """Assemble the optimization result and rationale for a chosen altitude"""
+        # Analyze jet stream
+        jet_stream = self.weather_service.get_jet_stream_info(
+            flight_plan.route_soa,
             best_altitude
         )
-        optimized_fuel = optimized_fuel_calc["total_fuel"]
         
         # Determine recommendation type
         altitude_change = abs(best_altitude - flight_plan.cruise_altitude)
@@ -238,9 +391,9 @@ class FuelOptimizationEngine:
         if jet_stream.get("present"):
             rationale_parts.append(f"Jet stream analysis: {jet_stream['benefit']}")
         
-        if optimized_fuel_calc["avg_wind_impact"] > 0:
+        if avg_wind_impact > 0:
             rationale_parts.append(
-                f"Favorable tailwind component of {optimized_fuel_calc['avg_wind_impact']:.0f} knots"
+                f"Favorable tailwind component of {avg_wind_impact:.0f} knots"
             )
         
         rationale = ". ".join(rationale_parts) if rationale_parts else "Standard optimization applied"
@@ -250,7 +403,6 @@ class FuelOptimizationEngine:
         if jet_stream.get("present"):
             weather_factors.append(f"Jet stream: {jet_stream['strength']} {jet_stream['direction']}")
         
-        avg_wind = sum(w.wind_speed for w in weather_data) / len(weather_data) if weather_data else 0
         if avg_wind > 100:
             weather_factors.append(f"Strong winds averaging {avg_wind:.0f} knots")
         
@@ -277,11 +429,26 @@ class FuelOptimizationEngine:
             cost_savings=fuel_savings * self.FUEL_PRICE_PER_KG
         )
     
+    def _get_aircraft(self, flight_plan: FlightPlan) -> Tuple[float, int, int, float]:
+        """Look up aircraft constants from _AIRCRAFT_FAST (B737-800 if unknown)"""
+        return self._AIRCRAFT_FAST.get(flight_plan.aircraft_type, self._AIRCRAFT_FAST["B737-800"])
+    
+    def _calculate_plan_distance(self, flight_plan: FlightPlan) -> float:
+        """Calculate route distance from the plan's coordinate arrays"""
+        lat, lon, _ = flight_plan.route_soa
+        return float(haversine_segments(lat, lon).sum())
+    
+    def _calculate_weight_factor(self, inv_weight_empty: float, flight_plan: FlightPlan) -> float:
+        """Calculate fuel burn factor from payload relative to empty weight"""
+        payload = flight_plan.cargo_weight + (flight_plan.passenger_count * 90)
+        return 1 + payload * inv_weight_empty * 0.15
+    
     def _calculate_altitude_factor(self, altitude: int, optimal_altitude: int) -> float:
         """Calculate fuel burn factor based on altitude deviation"""
-        deviation = abs(altitude - optimal_altitude)
-        # Each 2000 ft deviation increases fuel burn by ~1.5%
-        factor = 1.0 + (deviation / 2000) * 0.015
+        factor = self._ALTITUDE_FACTORS.get((optimal_altitude, altitude))
+        if factor is None:
+            # Non-standard altitude (e.g. a filed FL350)
+            factor = _altitude_factor(altitude, optimal_altitude)
         return factor
     
     def _calculate_wind_impact(
@@ -290,13 +457,24 @@ class FuelOptimizationEngine:
         weather_data: List[WeatherCondition]
     ) -> float:
         """Calculate average wind impact on ground speed"""
+        return self._calculate_wind_stats(flight_plan, weather_data)[0]
+    
+    def _calculate_wind_stats(
+        self,
+        flight_plan: FlightPlan,
+        weather_data: List[WeatherCondition]
+    ) -> Tuple[float, float]:
+        """Calculate average wind impact on ground speed and average wind speed in one pass"""
         if not weather_data:
-            return 0
+            return 0, 0
         
         # Calculate course for each leg
+        legs = len(flight_plan.route_waypoints) - 1
         total_impact = 0
+        total_speed = 0
         for i, weather in enumerate(weather_data):
-            if i < len(flight_plan.route_waypoints) - 1:
+            total_speed += weather.wind_speed
+            if i < legs:
                 # Simplified: assume general direction
                 # Positive = tailwind, Negative = headwind
                 wind_component = weather.wind_speed * 0.5  # Simplified calculation
@@ -304,4 +482,49 @@ class FuelOptimizationEngine:
                     wind_component = -wind_component
                 total_impact += wind_component
         
-        return total_impact / len(weather_data) if weather_data else 0
+        n = len(weather_data)
+        return total_impact / n, total_speed / n
+    
+    def _calculate_wind_stats_batch(
+        self,
+        flight_plans: List[FlightPlan],
+        weather: List[List[WeatherCondition]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized _calculate_wind_stats over many flights
+        
+        All weather records are flattened into one array and reduced per
+        flight with bincount, so the arithmetic runs once for the batch
+        rather than once per flight.
+        
+        Args:
+            flight_plans: Flight plans
+            weather: Weather conditions for each flight plan
+            
+        Returns:
+            Tuple of (average wind impact, average wind speed) arrays
+        """
+        counts = np.fromiter((len(w) for w in weather), dtype=np.int64, count=len(weather))
+        total = int(counts.sum())
+        speed = np.fromiter(
+            (c.wind_speed for w in weather for c in w), dtype=np.float64, count=total
+        )
+        direction = np.fromiter(
+            (c.wind_direction for w in weather for c in w), dtype=np.int32, count=total
+        )
+        legs = np.fromiter(
+            (len(fp.route_waypoints) - 1 for fp in flight_plans), dtype=np.int64, count=len(flight_plans)
+        )
+        
+        # Flight index and position within the route of every record
+        flight = np.repeat(np.arange(len(weather)), counts)
+        position = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        
+        # Positive = tailwind, Negative = headwind; only one record per leg counts
+        component = np.where(direction > 180, -0.5, 0.5) * speed
+        component[position >= legs[flight]] = 0
+        
+        n = np.maximum(counts, 1)
+        impact = np.bincount(flight, weights=component, minlength=len(weather)) / n
+        avg_speed = np.bincount(flight, weights=speed, minlength=len(weather)) / n
+        return impact, avg_speed
@@ -2,27 +2,40 @@
 Standalone Airline Fuel Optimization Agent Demo
 Simplified version without external dependencies for demonstration
 """
+import argparse
 import json
 import csv
+import logging
 import math
-from datetime import datetime
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, field, fields
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 
 # ==================== DATA MODELS ====================
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Waypoint:
     """Flight waypoint with coordinates"""
     name: str
     latitude: float
     longitude: float
     altitude: Optional[int] = None
+    lat_rad: float = field(init=False, repr=False)
+    lon_rad: float = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        # Radians are needed by every distance calculation; convert once
+        object.__setattr__(self, 'lat_rad', math.radians(self.latitude))
+        object.__setattr__(self, 'lon_rad', math.radians(self.longitude))
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class WeatherCondition:
     """Weather data for a location"""
     location: str
@@ -34,7 +47,7 @@ class WeatherCondition:
     conditions: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class FlightPlan:
     """Complete flight plan"""
     flight_id: str
@@ -49,7 +62,7 @@ class FlightPlan:
     cargo_weight: int = 5000
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class OptimizationResult:
     """Optimization result"""
     flight_id: str
@@ -75,21 +88,25 @@ class WeatherService:
         """Generate mock weather for waypoints"""
         import random
         
-        weather_data = []
-        for wp in waypoints:
-            base_temp = 15 - (wp.latitude / 10)
-            
-            weather_data.append(WeatherCondition(
+        # Draw each field for the whole route in one call
+        n = len(waypoints)
+        wind_speeds = random.choices([50, 75, 100, 125, 150], k=n)
+        wind_directions = random.choices([270, 280, 290, 300], k=n)
+        conditions = random.choices(["Clear", "Few Clouds", "Scattered Clouds"], k=n)
+        timestamp = datetime.now(timezone.utc).isoformat()
+        
+        return [
+            WeatherCondition(
                 location=wp.name,
-                timestamp=datetime.utcnow().isoformat(),
-                temperature=round(base_temp + random.uniform(-10, 10), 1),
-                wind_speed=random.choice([50, 75, 100, 125, 150]),
-                wind_direction=random.choice([270, 280, 290, 300]),
+                timestamp=timestamp,
+                temperature=round(15 - (wp.latitude / 10) + random.uniform(-10, 10), 1),
+                wind_speed=wind_speeds[i],
+                wind_direction=wind_directions[i],
                 visibility=10.0,
-                conditions=random.choice(["Clear", "Few Clouds", "Scattered Clouds"])
-            ))
-        
-        return weather_data
+                conditions=conditions[i]
+            )
+            for i, wp in enumerate(waypoints)
+        ]
 
 
 # ==================== OPTIMIZATION ENGINE ====================
@@ -110,39 +127,52 @@ class FuelOptimizationEngine:
     
     def calculate_distance(self, point1: Waypoint, point2: Waypoint) -> float:
         """Calculate great circle distance in nautical miles"""
-        lat1, lon1 = math.radians(point1.latitude), math.radians(point1.longitude)
-        lat2, lon2 = math.radians(point2.latitude), math.radians(point2.longitude)
+        lat1, lon1 = point1.lat_rad, point1.lon_rad
+        lat2, lon2 = point2.lat_rad, point2.lon_rad
         
         dlat = lat2 - lat1
         dlon = lon2 - lon1
         
         a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
+        a = min(a, 1.0)  # rounding can push a just past 1 for antipodal points
+        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
         
         return c * 3440.065  # Earth radius in nautical miles
     
     def calculate_route_distance(self, waypoints: List[Waypoint]) -> float:
         """Calculate total route distance"""
-        total = 0
-        for i in range(len(waypoints) - 1):
-            total += self.calculate_distance(waypoints[i], waypoints[i + 1])
-        return total
+        if len(waypoints) < 2:
+            return 0.0
+        
+        # Single pass: each waypoint's cosine is shared by the two legs it
+        # belongs to
+        prev = waypoints[0]
+        prev_lat, prev_lon = prev.lat_rad, prev.lon_rad
+        prev_cos = math.cos(prev_lat)
+        
+        total = 0.0
+        for wp in waypoints[1:]:
+            lat, lon = wp.lat_rad, wp.lon_rad
+            cos_lat = math.cos(lat)
+            
+            a = math.sin((lat - prev_lat)/2)**2 + prev_cos * cos_lat * math.sin((lon - prev_lon)/2)**2
+            a = min(a, 1.0)
+            total += 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+            
+            prev_lat, prev_lon, prev_cos = lat, lon, cos_lat
+        
+        return total * 3440.065  # Earth radius in nautical miles
     
-    def estimate_fuel(self, flight_plan: FlightPlan, altitude: int, weather: List[WeatherCondition]) -> float:
-        """Estimate fuel consumption"""
+    def estimate_fuel(self, flight_plan: FlightPlan, altitude: int, distance: float, wind_impact: float) -> float:
+        """Estimate fuel consumption for a precomputed route distance and wind impact"""
         aircraft = self.AIRCRAFT_DB.get(flight_plan.aircraft_type, self.AIRCRAFT_DB["B737-800"])
         
-        distance = self.calculate_route_distance(flight_plan.route_waypoints)
         burn_rate = aircraft["burn_rate"]
         
         # Altitude factor
         alt_deviation = abs(altitude - aircraft["optimal_alt"])
         burn_rate *= (1.0 + (alt_deviation / 2000) * 0.015)
         
-        # Wind impact (simplified)
-        avg_wind = sum(w.wind_speed for w in weather) / len(weather) if weather else 0
-        wind_impact = avg_wind * 0.3  # Simplified tailwind benefit
-        
         # Calculate flight time and fuel
         ground_speed = aircraft["speed"] + wind_impact
         flight_time = distance / ground_speed
@@ -153,24 +183,27 @@ class FuelOptimizationEngine:
     
     def optimize_flight(self, flight_plan: FlightPlan) -> OptimizationResult:
         """Perform fuel optimization"""
-        print(f"  → Analyzing weather...")
+        logger.debug("  → Analyzing weather...")
         weather = self.weather_service.fetch_weather_for_route(flight_plan.route_waypoints)
         
-        print(f"  → Testing altitude scenarios...")
-        original_fuel = self.estimate_fuel(flight_plan, flight_plan.cruise_altitude, weather)
+        # Distance and wind don't depend on altitude; compute them once
+        distance = self.calculate_route_distance(flight_plan.route_waypoints)
+        avg_wind = sum(w.wind_speed for w in weather) / len(weather) if weather else 0
+        wind_impact = avg_wind * 0.3  # Simplified tailwind benefit
         
-        # Test alternative altitudes
-        altitudes = [32000, 34000, 36000, 38000, 40000]
-        best_alt = flight_plan.cruise_altitude
-        best_fuel = original_fuel
+        logger.debug("  → Testing altitude scenarios...")
+        original_fuel = self.estimate_fuel(flight_plan, flight_plan.cruise_altitude, distance, wind_impact)
         
-        for alt in altitudes:
-            fuel = self.estimate_fuel(flight_plan, alt, weather)
-            if fuel < best_fuel:
-                best_alt = alt
-                best_fuel = fuel
+        # Fuel burn grows with deviation from the optimal altitude, so the
+        # best candidate is the closest one (ties keep the filed altitude)
+        altitudes = [32000, 34000, 36000, 38000, 40000]
+        optimal = self.AIRCRAFT_DB.get(flight_plan.aircraft_type, self.AIRCRAFT_DB["B737-800"])["optimal_alt"]
+        best_alt = min(altitudes, key=lambda a: abs(a - optimal))
+        if abs(flight_plan.cruise_altitude - optimal) <= abs(best_alt - optimal):
+            best_alt = flight_plan.cruise_altitude
+        best_fuel = self.estimate_fuel(flight_plan, best_alt, distance, wind_impact)
         
-        print(f"  → Computing optimal recommendation...")
+        logger.debug("  → Computing optimal recommendation...")
         fuel_savings = original_fuel - best_fuel
         savings_pct = (fuel_savings / original_fuel) * 100
         
@@ -181,7 +214,6 @@ class FuelOptimizationEngine:
                 f"Altitude change from FL{flight_plan.cruise_altitude//100} to FL{best_alt//100}"
             )
         
-        avg_wind = sum(w.wind_speed for w in weather) / len(weather) if weather else 0
         if avg_wind > 100:
             rationale_parts.append(f"Favorable winds averaging {avg_wind:.0f} knots")
         
@@ -216,6 +248,14 @@ class FuelOptimizationEngine:
 class FuelOptimizationAgent:
     """Main application"""
     
+    # Numeric CSV columns, coerced once while loading
+    CSV_TYPES = {
+        'planned_fuel': float,
+        'cruise_altitude': int,
+        'passenger_count': int,
+        'cargo_weight': int
+    }
+    
     def __init__(self, data_dir: str = "data"):
         self.data_dir = Path(data_dir)
         self.weather_service = WeatherService()
@@ -227,9 +267,11 @@ class FuelOptimizationAgent:
         flights = []
         csv_path = self.data_dir / "sample_flights.csv"
         
-        with open(csv_path, 'r') as f:
-            reader = csv.DictReader(f)
-            flights = list(reader)
+        with open(csv_path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                for column, cast in self.CSV_TYPES.items():
+                    row[column] = cast(row[column])
+                flights.append(row)
         
         with open(self.data_dir / "route_waypoints.json", 'r') as f:
             routes = json.load(f)
@@ -250,14 +292,14 @@ class FuelOptimizationAgent:
             aircraft_type=flight_data['aircraft_type'],
             departure_time=flight_data['departure_time'],
             route_waypoints=waypoints,
-            planned_fuel=float(flight_data['planned_fuel']),
-            cruise_altitude=int(flight_data['cruise_altitude']),
-            passenger_count=int(flight_data['passenger_count']),
-            cargo_weight=int(flight_data['cargo_weight'])
+            planned_fuel=flight_data['planned_fuel'],
+            cruise_altitude=flight_data['cruise_altitude'],
+            passenger_count=flight_data['passenger_count'],
+            cargo_weight=flight_data['cargo_weight']
         )
     
-    def run_optimization(self):
-        """Run batch optimization"""
+    def run_optimization(self, max_workers: Optional[int] = None):
+        """Run batch optimization, spreading flights over worker processes"""
         print("\n" + "=" * 60)
         print("AIRLINE FUEL OPTIMIZATION AGENT")
         print("Powered by AWS Strands and MCP")
@@ -267,21 +309,28 @@ class FuelOptimizationAgent:
         
         print(f"Loaded {len(flights)} flights for optimization\n")
         
-        for flight_data in flights:
-            print(f"Processing {flight_data['flight_id']}...")
-            
-            flight_plan = self.create_flight_plan(flight_data, routes)
-            result = self.optimization_engine.optimize_flight(flight_plan)
-            self.results.append(result)
+        # Flights are independent, so the CPU-bound optimization runs in a
+        # process pool; map() keeps results in flight order
+        flight_plans = [self.create_flight_plan(flight_data, routes) for flight_data in flights]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(self.optimization_engine.optimize_flight, flight_plans, chunksize=8)
             
-            print(f"\n✈️  {flight_plan.flight_id}: {flight_plan.origin} → {flight_plan.destination}")
-            print(f"   Fuel Savings: {result.fuel_savings:.1f} kg ({result.savings_percentage:.1f}%)")
-            print(f"   Cost Savings: ${result.cost_savings:.2f}")
-            print(f"   Recommendation: {result.recommendation_type.replace('_', ' ').title()}")
-            print(f"   Confidence: {result.confidence_score * 100:.0f}%\n")
+            for flight_plan, result in zip(flight_plans, results):
+                self.results.append(result)
+                self._print_result(flight_plan, result)
         
         self.generate_report()
     
+    def _print_result(self, flight_plan: FlightPlan, result: OptimizationResult):
+        """Print the outcome for one flight with a single write"""
+        sys.stdout.write(
+            f"\n✈️  {flight_plan.flight_id}: {flight_plan.origin} → {flight_plan.destination}\n"
+            f"   Fuel Savings: {result.fuel_savings:.1f} kg ({result.savings_percentage:.1f}%)\n"
+            f"   Cost Savings: ${result.cost_savings:.2f}\n"
+            f"   Recommendation: {result.recommendation_type.replace('_', ' ').title()}\n"
+            f"   Confidence: {result.confidence_score * 100:.0f}%\n\n"
+        )
+    
     def generate_report(self):
         """Generate summary report"""
         total_fuel_savings = sum(r.fuel_savings for r in self.results)
@@ -290,20 +339,27 @@ class FuelOptimizationAgent:
         high_priority = sum(1 for r in self.results if r.savings_percentage >= 3)
         
         report = {
-            "generated_at": datetime.utcnow().isoformat(),
+            "generated_at": datetime.now(timezone.utc).isoformat(),
             "total_flights": len(self.results),
             "summary": {
                 "total_fuel_savings_kg": round(total_fuel_savings, 1),
                 "total_cost_savings_usd": round(total_cost_savings, 2),
                 "average_confidence": round(avg_confidence, 3),
                 "high_priority_recommendations": high_priority
-            },
-            "flights": [asdict(r) for r in self.results]
+            }
         }
         
-        # Save report
+        # Save report, streaming one flight at a time; a shallow field dict
+        # avoids asdict()'s deep copy and the full list of flight dicts
+        names = [f.name for f in fields(OptimizationResult)]
+        header = json.dumps(report)
         with open('optimization_report.json', 'w') as f:
-            json.dump(report, f, indent=2)
+            f.write(header[:-1] + ', "flights": [')
+            for i, r in enumerate(self.results):
+                if i:
+                    f.write(', ')
+                f.write(json.dumps({name: getattr(r, name) for name in names}))
+            f.write(']}')
         
         print("\n" + "=" * 60)
         print("OPTIMIZATION SUMMARY")
@@ -318,5 +374,10 @@ class FuelOptimizationAgent:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-v", "--verbose", action="store_true", help="show per-flight progress")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+    
     agent = FuelOptimizationAgent(data_dir="../data")
     agent.run_optimization()
@@ -4,12 +4,18 @@ This module manages the multi-step optimization workflow using AWS Step Function
 """
 import json
 import logging
-from typing import Dict, Any
-from datetime import datetime
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Any, Optional
+from datetime import datetime, timezone
 from enum import Enum
 
 logger = logging.getLogger(__name__)
 
+# Most recent step records kept per orchestrator
+HISTORY_MAXLEN = 1024
+
 
 class WorkflowState(str, Enum):
     """Workflow states for the optimization pipeline"""
@@ -23,6 +29,107 @@ class WorkflowState(str, Enum):
     FAILED = "failed"
 
 
+@dataclass(slots=True)
+class StepRecord:
+    """One workflow history entry"""
+    state: WorkflowState
+    timestamp: str
+    status: str
+    duration_seconds: float = 0.0
+    error: str = ""
+
+
+# Static ASL definition; it has no runtime inputs, so it is built once at
+# import. Shared by every caller - treat it as read-only.
+_WORKFLOW_DEFINITION: Dict[str, Any] = {
+    "Comment": "Airline Fuel Optimization Workflow",
+    "StartAt": "DataIngestion",
+    "States": {
+        "DataIngestion": {
+            "Type": "Task",
+            "Resource": "arn:aws:lambda:REGION:ACCOUNT:function:FuelOptimizer-DataIngestion",
+            # Later states read the flight plan itself, not the step envelope
+            "OutputPath": "$.data",
+            "Next": "WeatherAnalysis",
+            "Retry": [
+                {
+                    "ErrorEquals": ["States.TaskFailed"],
+                    "IntervalSeconds": 2,
+                    "MaxAttempts": 3,
+                    "BackoffRate": 2.0
+                }
+            ],
+            "Catch": [
+                {
+                    "ErrorEquals": ["States.ALL"],
+                    "Next": "FailureHandler"
+                }
+            ]
+        },
+        "WeatherAnalysis": {
+            # Fan out one child execution per waypoint; the weather
+            # list lands next to the flight plan for the compute step
+            "Type": "Map",
+            "ItemsPath": "$.waypoints",
+            "MaxConcurrency": 40,
+            "ItemProcessor": {
+                "ProcessorConfig": {
+                    "Mode": "DISTRIBUTED",
+                    "ExecutionType": "EXPRESS"
+                },
+                "StartAt": "FetchWaypointWeather",
+                "States": {
+                    "FetchWaypointWeather": {
+                        "Type": "Task",
+                        "Resource": "arn:aws:lambda:REGION:ACCOUNT:function:FuelOptimizer-WeatherWaypoint:live",
+                        "End": True,
+                        "Retry": [
+                            {
+                                "ErrorEquals": ["States.TaskFailed"],
+                                "IntervalSeconds": 2,
+                                "MaxAttempts": 3,
+                                "BackoffRate": 2.0
+                            }
+                        ]
+                    }
+                }
+            },
+            "ResultPath": "$.weather_data",
+            "Next": "OptimizationCompute"
+        },
+        "OptimizationCompute": {
+            "Type": "Task",
+            "Resource": "arn:aws:lambda:REGION:ACCOUNT:function:FuelOptimizer-Compute:live",
+            "Next": "RecommendationGeneration",
+            "TimeoutSeconds": 300
+        },
+        "RecommendationGeneration": {
+            "Type": "Task",
+            "Resource": "arn:aws:lambda:REGION:ACCOUNT:function:FuelOptimizer-Recommendations:live",
+            "Next": "ResultsPublication"
+        },
+        "ResultsPublication": {
+            "Type": "Task",
+            "Resource": "arn:aws:lambda:REGION:ACCOUNT:function:FuelOptimizer-Publish",
+            "Next": "Success"
+        },
+        "Success": {
+            "Type": "Succeed"
+        },
+        "FailureHandler": {
+            "Type": "Task",
+            "Resource": "arn:aws:lambda:REGION:ACCOUNT:function:FuelOptimizer-FailureHandler",
+            "Next": "Fail"
+        },
+        "Fail": {
+            "Type": "Fail",
+            "Error": "WorkflowFailed",
+            "Cause": "Optimization workflow failed"
+        }
+    }
+}
+
+
 class StrandsOrchestrator:
     """
     Orchestrates the stateful ML workflow for fuel optimization
@@ -31,82 +138,25 @@ class StrandsOrchestrator:
     
     def __init__(self):
         """Initialize the orchestrator"""
-        self.workflow_history = []
+        self.workflow_history = deque(maxlen=HISTORY_MAXLEN)
+        self._completed = 0
+        self._dispatch: Dict[WorkflowState, Callable[[Dict, datetime], Dict]] = {
+            WorkflowState.DATA_INGESTION: self._step_data_ingestion,
+            WorkflowState.WEATHER_ANALYSIS: self._step_weather_analysis,
+            WorkflowState.OPTIMIZATION_COMPUTE: self._step_optimization_compute,
+            WorkflowState.RECOMMENDATION_GENERATION: self._step_recommendation_generation,
+            WorkflowState.RESULTS_PUBLICATION: self._step_results_publication
+        }
         
     def create_workflow_definition(self) -> Dict[str, Any]:
         """
         Create AWS Step Functions state machine definition
         
         Returns:
-            Step Functions state machine definition in ASL format
+            Step Functions state machine definition in ASL format (shared,
+            do not modify)
         """
-        return {
-            "Comment": "Airline Fuel Optimization Workflow",
-            "StartAt": "DataIngestion",
-            "States": {
-                "DataIngestion": {
-                    "Type": "Task",
-                    "Resource": "arn:aws:lambda:REGION:ACCOUNT:function:FuelOptimizer-DataIngestion",
-                    "Next": "WeatherAnalysis",
-                    "Retry": [
-                        {
-                            "ErrorEquals": ["States.TaskFailed"],
-                            "IntervalSeconds": 2,
-                            "MaxAttempts": 3,
-                            "BackoffRate": 2.0
-                        }
-                    ],
-                    "Catch": [
-                        {
-                            "ErrorEquals": ["States.ALL"],
-                            "Next": "FailureHandler"
-                        }
-                    ]
-                },
-                "WeatherAnalysis": {
-                    "Type": "Task",
-                    "Resource": "arn:aws:lambda:REGION:ACCOUNT:function:FuelOptimizer-WeatherAnalysis",
-                    "Next": "OptimizationCompute",
-                    "Retry": [
-                        {
-                            "ErrorEquals": ["States.TaskFailed"],
-                            "IntervalSeconds": 2,
-                            "MaxAttempts": 3,
-                            "BackoffRate": 2.0
-                        }
-                    ]
-                },
-                "OptimizationCompute": {
-                    "Type": "Task",
-                    "Resource": "arn:aws:lambda:REGION:ACCOUNT:function:FuelOptimizer-Compute",
-                    "Next": "RecommendationGeneration",
-                    "TimeoutSeconds": 300
-                },
-                "RecommendationGeneration": {
-                    "Type": "Task",
-                    "Resource": "arn:aws:lambda:REGION:ACCOUNT:function:FuelOptimizer-Recommendations",
-                    "Next": "ResultsPublication"
-                },
-                "ResultsPublication": {
-                    "Type": "Task",
-                    "Resource": "arn:aws:lambda:REGION:ACCOUNT:function:FuelOptimizer-Publish",
-                    "Next": "Success"
-                },
-                "Success": {
-                    "Type": "Succeed"
-                },
-                "FailureHandler": {
-                    "Type": "Task",
-                    "Resource": "arn:aws:lambda:REGION:ACCOUNT:function:FuelOptimizer-FailureHandler",
-                    "Next": "Fail"
-                },
-                "Fail": {
-                    "Type": "Fail",
-                    "Error": "WorkflowFailed",
-                    "Cause": "Optimization workflow failed"
-                }
-            }
-        }
+        return _WORKFLOW_DEFINITION
     
     def execute_workflow_step(
         self,
@@ -123,53 +173,48 @@ class StrandsOrchestrator:
         Returns:
             Output data from the step
         """
-        logger.info(f"Executing workflow step: {state}")
+        logger.info("Executing workflow step: %s", state)
         
-        step_start = datetime.utcnow()
+        # Monotonic clock for the duration; one wall-clock read per transition
+        t0 = time.perf_counter()
+        now = datetime.now(timezone.utc)
         
         try:
             # Record state transition
-            self.workflow_history.append({
-                "state": state,
-                "timestamp": step_start.isoformat(),
-                "status": "started"
-            })
+            self.workflow_history.append(StepRecord(
+                state=state,
+                timestamp=now.isoformat(),
+                status="started"
+            ))
             
             # Execute step logic based on state
-            if state == WorkflowState.DATA_INGESTION:
-                output = self._step_data_ingestion(input_data)
-            elif state == WorkflowState.WEATHER_ANALYSIS:
-                output = self._step_weather_analysis(input_data)
-            elif state == WorkflowState.OPTIMIZATION_COMPUTE:
-                output = self._step_optimization_compute(input_data)
-            elif state == WorkflowState.RECOMMENDATION_GENERATION:
-                output = self._step_recommendation_generation(input_data)
-            elif state == WorkflowState.RESULTS_PUBLICATION:
-                output = self._step_results_publication(input_data)
-            else:
+            handler = self._dispatch.get(state)
+            if handler is None:
                 raise ValueError(f"Unknown workflow state: {state}")
+            output = handler(input_data, now)
             
             # Record success
-            self.workflow_history.append({
-                "state": state,
-                "timestamp": datetime.utcnow().isoformat(),
-                "status": "completed",
-                "duration_seconds": (datetime.utcnow() - step_start).total_seconds()
-            })
+            self.workflow_history.append(StepRecord(
+                state=state,
+                timestamp=datetime.now(timezone.utc).isoformat(),
+                status="completed",
+                duration_seconds=time.perf_counter() - t0
+            ))
+            self._completed += 1
             
             return output
             
         except Exception as e:
-            logger.error(f"Error in workflow step {state}: {e}")
-            self.workflow_history.append({
-                "state": state,
-                "timestamp": datetime.utcnow().isoformat(),
-                "status": "failed",
-                "error": str(e)
-            })
+            logger.error("Error in workflow step %s: %s", state, e)
+            self.workflow_history.append(StepRecord(
+                state=state,
+                timestamp=datetime.now(timezone.utc).isoformat(),
+                status="failed",
+                error=str(e)
+            ))
             raise
     
-    def _step_data_ingestion(self, input_data: Dict) -> Dict:
+    def _step_data_ingestion(self, input_data: Dict, now: Optional[datetime] = None) -> Dict:
         """Data ingestion step"""
         logger.info("Step 1: Data Ingestion")
         return {
@@ -179,7 +224,7 @@ class StrandsOrchestrator:
             "next_state": WorkflowState.WEATHER_ANALYSIS
         }
     
-    def _step_weather_analysis(self, input_data: Dict) -> Dict:
+    def _step_weather_analysis(self, input_data: Dict, now: Optional[datetime] = None) -> Dict:
         """Weather analysis step"""
         logger.info("Step 2: Weather Analysis")
         return {
@@ -189,7 +234,7 @@ class StrandsOrchestrator:
             "next_state": WorkflowState.OPTIMIZATION_COMPUTE
         }
     
-    def _step_optimization_compute(self, input_data: Dict) -> Dict:
+    def _step_optimization_compute(self, input_data: Dict, now: Optional[datetime] = None) -> Dict:
         """Optimization computation step"""
         logger.info("Step 3: Optimization Compute")
         return {
@@ -199,7 +244,7 @@ class StrandsOrchestrator:
             "next_state": WorkflowState.RECOMMENDATION_GENERATION
         }
     
-    def _step_recommendation_generation(self, input_data: Dict) -> Dict:
+    def _step_recommendation_generation(self, input_data: Dict, now: Optional[datetime] = None) -> Dict:
         """Recommendation generation step"""
         logger.info("Step 4: Recommendation Generation")
         return {
@@ -209,13 +254,13 @@ class StrandsOrchestrator:
             "next_state": WorkflowState.RESULTS_PUBLICATION
         }
     
-    def _step_results_publication(self, input_data: Dict) -> Dict:
+    def _step_results_publication(self, input_data: Dict, now: Optional[datetime] = None) -> Dict:
         """Results publication step"""
         logger.info("Step 5: Results Publication")
         return {
             "step": "results_publication",
             "published": True,
-            "publication_timestamp": datetime.utcnow().isoformat(),
+            "publication_timestamp": (now or datetime.now(timezone.utc)).isoformat(),
             "next_state": WorkflowState.COMPLETED
         }
     
@@ -224,23 +269,23 @@ class StrandsOrchestrator:
         Get current workflow status
         
         Returns:
-            Workflow status information
+            Workflow status information; history entries are plain dicts
         """
         if not self.workflow_history:
             return {"status": "not_started", "history": []}
         
         last_step = self.workflow_history[-1]
-        completed_steps = [h for h in self.workflow_history if h.get("status") == "completed"]
         
         return {
-            "status": last_step.get("status"),
-            "current_state": last_step.get("state"),
-            "completed_steps": len(completed_steps),
+            "status": last_step.status,
+            "current_state": last_step.state,
+            "completed_steps": self._completed,
             "total_steps": 5,
-            "history": self.workflow_history
+            "history": [asdict(record) for record in self.workflow_history]
         }
     
     def reset_workflow(self):
         """Reset workflow state"""
-        self.workflow_history = []
+        self.workflow_history.clear()
+        self._completed = 0
         logger.info("Workflow reset")
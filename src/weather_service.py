@@ -1,18 +1,59 @@
 """
 Weather data service for fetching and parsing METAR/TAF data
 """
-import requests
 import logging
-from typing import List, Optional
-from datetime import datetime
+import time
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional, Union
+from datetime import datetime, timezone
+
+import numpy as np
+
 from models import WeatherCondition, Waypoint
+from waypoint_arrays import RouteArrays, wind_soa
 
 logger = logging.getLogger(__name__)
 
+# Mock weather distributions, indexed by integer draws
+MOCK_WIND_DIRECTIONS = np.array([270, 280, 290, 300])  # Westerly winds (jet stream)
+MOCK_WIND_SPEEDS = np.array([50, 75, 100, 125, 150])  # Knots
+MOCK_CONDITIONS = np.array(
+    ["Clear", "Few Clouds", "Scattered Clouds", "Broken Clouds", "Light Turbulence"],
+    dtype=object
+)
+
+# The only two jet stream verdicts; shared read-only rather than rebuilt per call
+JET_STREAM_STRONG = MappingProxyType({
+    "present": True,
+    "strength": "strong",
+    "direction": "westerly",
+    "benefit": "Favorable for westbound flights at this altitude"
+})
+JET_STREAM_ABSENT = MappingProxyType({
+    "present": False,
+    "strength": "none",
+    "direction": None,
+    "benefit": None
+})
+
+
+def _metar_stamp(ts: datetime) -> str:
+    """Format a METAR day/time group (DDHHMMZ) without strftime"""
+    return f"{ts.day:02d}{ts.hour:02d}{ts.minute:02d}Z"
+
 
 class WeatherService:
     """Service for fetching and processing weather data"""
     
+    # Upper bound on concurrent per-waypoint API requests
+    MAX_FETCH_WORKERS = 32
+    
+    # Waypoint weather is cached per UTC hour on a 1/CACHE_GRID degree grid
+    CACHE_GRID = 4
+    CACHE_SIZE = 4096
+    
     def __init__(self, api_key: Optional[str] = None):
         """
         Initialize weather service
@@ -22,7 +63,9 @@ class WeatherService:
         """
         self.api_key = api_key
         self.base_url = "https://api.openweathermap.org/data/2.5"
-        
+        self._rng = np.random.default_rng()
+        self._fetch_cached = lru_cache(maxsize=self.CACHE_SIZE)(self._fetch_grid_cell)
+    
     def fetch_weather_for_waypoint(self, waypoint: Waypoint) -> Optional[WeatherCondition]:
         """
         Fetch current weather for a waypoint
@@ -34,11 +77,57 @@ class WeatherService:
             WeatherCondition object or None if fetch fails
         """
         try:
-            # In production, use real API. For demo, generate realistic data
-            return self._generate_mock_weather(waypoint)
+            # Weather is spatially correlated and METARs update about hourly,
+            # so nearby waypoints within the same hour share one fetch
+            weather = self._fetch_cached(
+                round(waypoint.latitude * self.CACHE_GRID),
+                round(waypoint.longitude * self.CACHE_GRID),
+                int(time.time() // 3600)
+            )
         except Exception as e:
             logger.error(f"Error fetching weather for {waypoint.name}: {e}")
             return None
+        
+        return weather.model_copy(update={
+            "location": waypoint.name,
+            "metar_raw": f"METAR {waypoint.name} AUTO {_metar_stamp(weather.timestamp)}"
+        })
+    
+    def clear_cache(self):
+        """Drop all cached waypoint weather"""
+        self._fetch_cached.cache_clear()
+    
+    def warmup(self):
+        """
+        Run each weather code path once so its first-call setup is paid now
+        
+        Meant for Lambda INIT under provisioned concurrency or SnapStart.
+        The cache is cleared afterwards so the dummy fetch never answers a
+        real request.
+        """
+        dummy = Waypoint(name="WARMUP", latitude=40.0, longitude=-75.0)
+        
+        weather = self.fetch_weather_for_waypoint(dummy)
+        self.analyze_wind_component(weather, 270)
+        self.fetch_weather_for_route([dummy, dummy])
+        self.get_jet_stream_info([dummy, dummy], 36000)
+        self.clear_cache()
+    
+    def _fetch_grid_cell(self, lat_q: int, lon_q: int, hour_bucket: int) -> WeatherCondition:
+        """
+        Fetch weather for one grid cell (uncached)
+        
+        Args:
+            lat_q: Latitude in 1/CACHE_GRID degree units
+            lon_q: Longitude in 1/CACHE_GRID degree units
+            hour_bucket: Hours since the epoch; only part of the cache key
+            
+        Returns:
+            Weather condition for the cell center
+        """
+        # In production, use real API. For demo, generate realistic data
+        cell = Waypoint(name="", latitude=lat_q / self.CACHE_GRID, longitude=lon_q / self.CACHE_GRID)
+        return self._generate_mock_weather(cell)
     
     def fetch_weather_for_route(self, waypoints: List[Waypoint]) -> List[WeatherCondition]:
         """
@@ -50,12 +139,21 @@ class WeatherService:
         Returns:
             List of weather conditions
         """
-        weather_data = []
-        for waypoint in waypoints:
-            weather = self.fetch_weather_for_waypoint(waypoint)
-            if weather:
-                weather_data.append(weather)
-        return weather_data
+        if not waypoints:
+            return []
+        
+        if self.api_key is None:
+            try:
+                # Demo mode: generate the whole route at once
+                return self._generate_mock_route_weather(waypoints)
+            except Exception as e:
+                logger.error(f"Error fetching route weather: {e}")
+                return []
+        
+        # API fetches are network-bound; overlap the per-waypoint round-trips
+        workers = min(self.MAX_FETCH_WORKERS, len(waypoints))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return [w for w in executor.map(self.fetch_weather_for_waypoint, waypoints) if w]
     
     def _generate_mock_weather(self, waypoint: Waypoint) -> WeatherCondition:
         """
@@ -67,26 +165,48 @@ class WeatherService:
         Returns:
             Mock weather condition
         """
-        import random
+        return self._generate_mock_route_weather([waypoint])[0]
+    
+    def _generate_mock_route_weather(self, waypoints: List[Waypoint]) -> List[WeatherCondition]:
+        """
+        Generate mock weather for a whole route in bulk
+        
+        Every random value for the route is drawn in one vectorized call
+        per field; categorical fields are drawn as indices into the
+        module-level MOCK_* tables.
         
-        # Simulate realistic weather variations
-        base_temp = 15 - (waypoint.latitude / 10)  # Colder at higher latitudes
+        Args:
+            waypoints: Route waypoints
+            
+        Returns:
+            Mock weather conditions, one per waypoint
+        """
+        n = len(waypoints)
+        rng = self._rng
         
-        wind_directions = [270, 280, 290, 300]  # Westerly winds (jet stream)
-        wind_speeds = [50, 75, 100, 125, 150]  # Knots
+        # Simulate realistic weather variations; colder at higher latitudes
+        latitude = np.fromiter((wp.latitude for wp in waypoints), dtype=np.float64, count=n)
+        temperatures = np.round(15 - latitude / 10 + rng.uniform(-10, 10, size=n), 1).tolist()
+        wind_speeds = MOCK_WIND_SPEEDS[rng.integers(0, len(MOCK_WIND_SPEEDS), size=n)].tolist()
+        wind_directions = MOCK_WIND_DIRECTIONS[rng.integers(0, len(MOCK_WIND_DIRECTIONS), size=n)].tolist()
+        conditions = MOCK_CONDITIONS[rng.integers(0, len(MOCK_CONDITIONS), size=n)].tolist()
         
-        conditions_list = ["Clear", "Few Clouds", "Scattered Clouds", "Broken Clouds", "Light Turbulence"]
+        now = datetime.now(timezone.utc)
+        stamp = _metar_stamp(now)
         
-        return WeatherCondition(
-            location=waypoint.name,
-            timestamp=datetime.utcnow(),
-            temperature=round(base_temp + random.uniform(-10, 10), 1),
-            wind_speed=random.choice(wind_speeds),
-            wind_direction=random.choice(wind_directions),
-            visibility=10.0,
-            conditions=random.choice(conditions_list),
-            metar_raw=f"METAR {waypoint.name} AUTO {datetime.utcnow().strftime('%d%H%MZ')}"
-        )
+        return [
+            WeatherCondition(
+                location=wp.name,
+                timestamp=now,
+                temperature=temperatures[i],
+                wind_speed=wind_speeds[i],
+                wind_direction=wind_directions[i],
+                visibility=10.0,
+                conditions=conditions[i],
+                metar_raw=f"METAR {wp.name} AUTO {stamp}"
+            )
+            for i, wp in enumerate(waypoints)
+        ]
     
     def analyze_wind_component(self, weather: WeatherCondition, course: int) -> Dict[str, float]:
         """
@@ -99,50 +219,72 @@ class WeatherService:
         Returns:
             Dict with headwind/tailwind and crosswind components
         """
-        import math
+        components = self.analyze_wind_components([weather], course)
+        return {name: float(values[0]) for name, values in components.items()}
+    
+    def analyze_wind_components(self, weathers: List[WeatherCondition], course: float) -> Dict[str, np.ndarray]:
+        """
+        Analyze headwind/tailwind components for many weather reports at once
         
-        # Calculate angle difference
-        angle_diff = abs(weather.wind_direction - course)
-        if angle_diff > 180:
-            angle_diff = 360 - angle_diff
+        Args:
+            weathers: Weather conditions, e.g. one per route waypoint
+            course: Aircraft course (degrees)
+            
+        Returns:
+            Dict of headwind, tailwind and crosswind arrays, one entry per
+            weather condition, plus crosswind_signed (positive when the
+            wind comes from the right of course)
+        """
+        direction, speed = wind_soa(weathers)
+        
+        # Raw angle difference: cosine is even and 360-periodic, so no fold
+        # into [0, 180] is needed, and sine keeps the crosswind side
+        angle_rad = np.radians(direction - course)
         
         # Calculate components
-        headwind_component = weather.wind_speed * math.cos(math.radians(angle_diff))
-        crosswind_component = weather.wind_speed * math.sin(math.radians(angle_diff))
+        headwind_component = speed * np.cos(angle_rad)
+        crosswind_component = speed * np.sin(angle_rad)
         
         return {
-            "headwind": headwind_component if headwind_component > 0 else 0,
-            "tailwind": abs(headwind_component) if headwind_component < 0 else 0,
-            "crosswind": crosswind_component
+            "headwind": np.maximum(headwind_component, 0),
+            "tailwind": np.maximum(-headwind_component, 0),
+            "crosswind": np.abs(crosswind_component),
+            "crosswind_signed": crosswind_component
         }
     
-    def get_jet_stream_info(self, waypoints: List[Waypoint], altitude: int) -> Dict:
+    def get_jet_stream_info(
+        self,
+        waypoints: Union[List[Waypoint], RouteArrays, np.ndarray],
+        altitude: int
+    ) -> Mapping:
         """
         Analyze jet stream effects on route
         
         Args:
-            waypoints: Route waypoints
+            waypoints: Route waypoints, their RouteArrays (e.g.
+                FlightPlan.route_soa) or a prebuilt latitude array
             altitude: Cruise altitude
             
         Returns:
-            Jet stream analysis
+            Jet stream analysis (read-only; shared between calls)
         """
+        if isinstance(waypoints, RouteArrays):
+            waypoints = waypoints.lat
+        
         # Simplified: jet stream typically at 30000-40000 ft, westerly
-        if 30000 <= altitude <= 42000:
-            avg_latitude = sum(w.latitude for w in waypoints) / len(waypoints)
+        if 30000 <= altitude <= 42000 and len(waypoints):
+            if isinstance(waypoints, np.ndarray):
+                lats = waypoints
+            else:
+                lats = np.fromiter((w.latitude for w in waypoints), dtype=np.float64, count=len(waypoints))
+            abs_lat = np.abs(lats)
             
-            # Jet stream strongest at 30-60 degrees latitude
-            if 30 <= abs(avg_latitude) <= 60:
-                return {
-                    "present": True,
-                    "strength": "strong",
-                    "direction": "westerly",
-                    "benefit": "Favorable for westbound flights at this altitude"
-                }
+            # Jet stream strongest at 30-60 degrees latitude; require most of
+            # the route in that band rather than just its average. The verdict
+            # depends on every latitude, so there is no small key to memoize
+            # on; an integer count keeps the one reduction cheap instead
+            in_band = np.count_nonzero((abs_lat >= 30) & (abs_lat <= 60))
+            if 2 * in_band > len(lats):
+                return JET_STREAM_STRONG
         
-        return {
-            "present": False,
-            "strength": "none",
-            "direction": None,
-            "benefit": None
-        }
+        return JET_STREAM_ABSENT
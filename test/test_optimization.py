@@ -1,14 +1,56 @@
 """
 Unit tests for Airline Fuel Optimization Agent
 """
+import json
+import numpy as np
 import pytest
-from datetime import datetime
+from pydantic import ValidationError
+from datetime import datetime, timezone
 import sys
 sys.path.insert(0, '../src')
 
-from models import FlightPlan, Waypoint, AircraftPerformance
+from models import (
+    FlightPlan, Waypoint, AircraftPerformance,
+    OptimizationRecommendation, RecommendationType
+)
 from weather_service import WeatherService
 from optimization_engine import FuelOptimizationEngine
+from mcp_integration import MCPIntegration
+from strands_orchestrator import StrandsOrchestrator, WorkflowState
+from waypoint_arrays import to_soa
+from main import FuelOptimizationAgent
+import lambda_handler
+
+
+# Services are stateless apart from caches, so one instance serves the session
+@pytest.fixture(scope="session")
+def weather_service():
+    return WeatherService()
+
+
+@pytest.fixture(scope="session")
+def engine(weather_service):
+    return FuelOptimizationEngine(weather_service)
+
+
+@pytest.fixture(scope="session")
+def flight_plan():
+    """JFK-LAX B737-800 plan at FL360"""
+    return FlightPlan(
+        flight_id="TEST001",
+        origin="JFK",
+        destination="LAX",
+        aircraft_type="B737-800",
+        departure_time=datetime.now(timezone.utc),
+        route_waypoints=[
+            Waypoint(name="JFK", latitude=40.64, longitude=-73.78),
+            Waypoint(name="LAX", latitude=33.94, longitude=-118.41)
+        ],
+        planned_fuel=15000,
+        cruise_altitude=36000,
+        passenger_count=150,
+        cargo_weight=5000
+    )
 
 
 class TestModels:
@@ -21,6 +63,15 @@ class TestModels:
         assert -90 <= wp.latitude <= 90
         assert -180 <= wp.longitude <= 180
     
+    def test_waypoint_is_frozen(self):
+        """Test waypoints are immutable and hashable"""
+        wp = Waypoint(name="JFK", latitude=40.6413, longitude=-73.7781)
+        
+        with pytest.raises(ValidationError):
+            wp.latitude = 0.0
+        
+        assert hash(wp) == hash(Waypoint(name="JFK", latitude=40.6413, longitude=-73.7781))
+    
     def test_flight_plan_creation(self):
         """Test flight plan model"""
         waypoints = [
@@ -33,7 +84,7 @@ class TestModels:
             origin="JFK",
             destination="LAX",
             aircraft_type="B737-800",
-            departure_time=datetime.utcnow(),
+            departure_time=datetime.now(timezone.utc),
             route_waypoints=waypoints,
             planned_fuel=15000,
             cruise_altitude=36000
@@ -42,43 +93,96 @@ class TestModels:
         assert fp.flight_id == "TEST001"
         assert len(fp.route_waypoints) == 2
         assert fp.cruise_altitude == 36000
+    
+    def test_route_arrays_follow_waypoint_edits(self, engine, flight_plan):
+        """Test route arrays reflect waypoints replaced in place"""
+        fp = flight_plan.model_copy(deep=True)
+        assert engine.estimate_fuel_consumption(fp, [], 36000)["distance_nm"] == pytest.approx(2146.0, abs=0.1)
+        
+        fp.route_waypoints[1] = Waypoint(name="ORD", latitude=41.98, longitude=-87.90)
+        assert engine.estimate_fuel_consumption(fp, [], 36000)["distance_nm"] == pytest.approx(641.1, abs=0.1)
 
 
 class TestWeatherService:
     """Test weather service"""
     
-    def test_weather_fetch(self):
+    def test_weather_fetch(self, weather_service):
         """Test weather fetching"""
-        service = WeatherService()
         wp = Waypoint(name="TEST", latitude=40.0, longitude=-75.0)
         
-        weather = service.fetch_weather_for_waypoint(wp)
+        weather = weather_service.fetch_weather_for_waypoint(wp)
         
         assert weather is not None
         assert weather.location == "TEST"
         assert weather.wind_speed > 0
     
-    def test_wind_component_analysis(self):
-        """Test wind component calculation"""
+    def test_weather_cached_by_grid_cell(self, weather_service):
+        """Test nearby waypoints share cached weather under their own names"""
+        first = weather_service.fetch_weather_for_waypoint(Waypoint(name="A", latitude=40.0, longitude=-75.0))
+        second = weather_service.fetch_weather_for_waypoint(Waypoint(name="B", latitude=40.01, longitude=-75.01))
+        
+        assert second.location == "B"
+        assert second.wind_speed == first.wind_speed
+        assert second.timestamp == first.timestamp
+        
+        weather_service.clear_cache()
+        assert weather_service._fetch_cached.cache_info().currsize == 0
+    
+    def test_warmup_leaves_cache_empty(self):
+        """Test warmup runs without leaving dummy weather in the cache"""
         service = WeatherService()
+        service.warmup()
+        
+        assert service._fetch_cached.cache_info().currsize == 0
+    
+    def test_wind_component_analysis(self, weather_service):
+        """Test wind component calculation"""
         wp = Waypoint(name="TEST", latitude=40.0, longitude=-75.0)
-        weather = service.fetch_weather_for_waypoint(wp)
+        weather = weather_service.fetch_weather_for_waypoint(wp)
         
-        components = service.analyze_wind_component(weather, 270)
+        components = weather_service.analyze_wind_component(weather, 270)
         
         assert "headwind" in components
         assert "tailwind" in components
         assert "crosswind" in components
+    
+    def test_wind_components_batch_matches_scalar(self, weather_service):
+        """Test vectorized wind components agree with the per-report version"""
+        waypoints = [
+            Waypoint(name=f"WP{i}", latitude=40.0, longitude=-75.0 + i) for i in range(6)
+        ]
+        weathers = weather_service.fetch_weather_for_route(waypoints)
+        
+        batch = weather_service.analyze_wind_components(weathers, 90)
+        
+        for i, weather in enumerate(weathers):
+            single = weather_service.analyze_wind_component(weather, 90)
+            for name, value in single.items():
+                assert batch[name][i] == pytest.approx(value)
+    
+    def test_jet_stream_accepts_latitude_array(self, weather_service):
+        """Test jet stream analysis gives the same answer for waypoints or their arrays"""
+        waypoints = [
+            Waypoint(name="JFK", latitude=40.64, longitude=-73.78),
+            Waypoint(name="LAX", latitude=33.94, longitude=-118.41),
+            Waypoint(name="HNL", latitude=21.32, longitude=-157.92)
+        ]
+        lats = np.array([w.latitude for w in waypoints])
+        
+        jet_stream = weather_service.get_jet_stream_info
+        
+        assert jet_stream(waypoints, 36000) == jet_stream(lats, 36000)
+        assert jet_stream(to_soa(waypoints), 36000) == jet_stream(lats, 36000)
+        assert jet_stream(lats, 36000)["present"]
+        assert not jet_stream(lats[1:], 36000)["present"]
+        assert not jet_stream(lats, 25000)["present"]
 
 
 class TestOptimizationEngine:
     """Test optimization engine"""
     
-    def test_distance_calculation(self):
+    def test_distance_calculation(self, engine):
         """Test great circle distance"""
-        service = WeatherService()
-        engine = FuelOptimizationEngine(service)
-        
         jfk = Waypoint(name="JFK", latitude=40.6413, longitude=-73.7781)
         lax = Waypoint(name="LAX", latitude=33.9416, longitude=-118.4085)
         
@@ -87,36 +191,231 @@ class TestOptimizationEngine:
         # JFK to LAX is approximately 2,150 nautical miles
         assert 2100 < distance < 2200
     
-    def test_fuel_optimization(self):
-        """Test fuel optimization"""
-        service = WeatherService()
-        engine = FuelOptimizationEngine(service)
-        
+    def test_route_distance_matches_legs(self, engine):
+        """Test vectorized route distance equals the sum of its legs"""
         waypoints = [
             Waypoint(name="JFK", latitude=40.64, longitude=-73.78),
+            Waypoint(name="CHERI", latitude=39.80, longitude=-85.10),
             Waypoint(name="LAX", latitude=33.94, longitude=-118.41)
         ]
         
-        fp = FlightPlan(
-            flight_id="TEST001",
-            origin="JFK",
-            destination="LAX",
-            aircraft_type="B737-800",
-            departure_time=datetime.utcnow(),
-            route_waypoints=waypoints,
-            planned_fuel=15000,
-            cruise_altitude=36000,
-            passenger_count=150,
-            cargo_weight=5000
+        expected = sum(
+            engine.calculate_distance(waypoints[i], waypoints[i + 1])
+            for i in range(len(waypoints) - 1)
         )
         
-        result = engine.optimize_flight(fp)
+        assert engine.calculate_route_distance(waypoints) == pytest.approx(expected)
+        assert engine.calculate_route_distance(waypoints[:1]) == 0
+    
+    def test_antipodal_distance(self, engine):
+        """Test antipodal legs don't fail on rounding past a = 1"""
+        lat, lon = 0.975379294871658, -46.34163525895954
+        origin = Waypoint(name="A", latitude=lat, longitude=lon)
+        antipode = Waypoint(name="B", latitude=-lat, longitude=lon + 180)
+        
+        assert engine.calculate_distance(origin, antipode) == pytest.approx(10807.28, abs=0.01)
+        assert engine.calculate_route_distance([origin, antipode]) == pytest.approx(10807.28, abs=0.01)
+    
+    def test_fuel_optimization(self, engine, flight_plan):
+        """Test fuel optimization"""
+        result = engine.optimize_flight(flight_plan)
         
         assert result is not None
         assert result.flight_id == "TEST001"
         assert result.fuel_savings >= 0
         assert 0 <= result.confidence_score <= 1
+    
+    def test_fuel_monotone_in_altitude_deviation(self, engine, flight_plan):
+        """Test fuel burn never decreases as altitude moves away from optimal"""
+        optimal = engine.AIRCRAFT_DB["B737-800"].optimal_cruise_altitude
+        
+        altitudes = sorted(range(28000, 44000, 1000), key=lambda a: abs(a - optimal))
+        fuel = [engine.estimate_fuel_consumption(flight_plan, [], alt)["total_fuel"] for alt in altitudes]
+        
+        assert fuel == sorted(fuel)
+    
+    def test_batch_optimization_matches_single(self, weather_service, engine):
+        """Test vectorized batch fuel and altitudes agree with the per-flight path"""
+        routes = [
+            [
+                Waypoint(name="JFK", latitude=40.64, longitude=-73.78),
+                Waypoint(name="LAX", latitude=33.94, longitude=-118.41)
+            ],
+            [
+                Waypoint(name="ORD", latitude=41.97, longitude=-87.90),
+                Waypoint(name="DEN", latitude=39.86, longitude=-104.67),
+                Waypoint(name="SFO", latitude=37.62, longitude=-122.38)
+            ]
+        ]
+        plans = [
+            FlightPlan(
+                flight_id=f"TEST00{i}",
+                origin=route[0].name,
+                destination=route[-1].name,
+                aircraft_type=aircraft_type,
+                departure_time=datetime.now(timezone.utc),
+                route_waypoints=route,
+                planned_fuel=15000,
+                cruise_altitude=altitude
+            )
+            for i, (route, aircraft_type, altitude) in enumerate(
+                zip(routes, ["B737-800", "A320"], [32000, 35000])
+            )
+        ]
+        altitudes = list(engine.ALTITUDE_OPTIONS)
+        
+        matrix = engine.estimate_fuel_matrix(plans, altitudes, np.zeros(len(plans)))
+        for row, fp in zip(matrix, plans):
+            expected = [engine.estimate_fuel_consumption(fp, [], alt)["total_fuel"] for alt in altitudes]
+            assert row == pytest.approx(expected, abs=0.1)
+        
+        batch = engine.optimize_flights(plans)
+        single = [engine.optimize_flight(fp) for fp in plans]
+        
+        assert [r.flight_id for r in batch] == ["TEST000", "TEST001"]
+        assert [r.optimized_altitude for r in batch] == [r.optimized_altitude for r in single]
+        
+        weather = [weather_service.fetch_weather_for_route(fp.route_waypoints) for fp in plans] + [[]]
+        impacts, speeds = engine._calculate_wind_stats_batch(plans + plans[:1], weather)
+        for fp, w, impact, speed in zip(plans + plans[:1], weather, impacts, speeds):
+            assert (impact, speed) == pytest.approx(engine._calculate_wind_stats(fp, w))
+
 
+class TestStrandsOrchestrator:
+    """Test workflow orchestration"""
+    
+    def test_workflow_status_counts_completed_steps(self):
+        """Test status tracks completed steps and failures without rescanning history"""
+        orchestrator = StrandsOrchestrator()
+        
+        orchestrator.execute_workflow_step(WorkflowState.DATA_INGESTION, {"flight_plan": {}})
+        orchestrator.execute_workflow_step(WorkflowState.WEATHER_ANALYSIS, {})
+        with pytest.raises(ValueError):
+            orchestrator.execute_workflow_step(WorkflowState.COMPLETED, {})
+        
+        status = orchestrator.get_workflow_status()
+        assert status["completed_steps"] == 2
+        assert status["status"] == "failed"
+        assert status["history"][-1]["error"]
+        assert json.loads(json.dumps(status))["history"][0]["state"] == "data_ingestion"
+        
+        orchestrator.reset_workflow()
+        assert orchestrator.get_workflow_status()["status"] == "not_started"
+
+
+class TestMCPIntegration:
+    """Test MCP integration"""
+    
+    def test_publish_many_batches(self):
+        """Test batch publication returns one result per recommendation"""
+        mcp = MCPIntegration()
+        recommendations = [
+            OptimizationRecommendation(
+                flight_id=f"TEST{i:03d}",
+                recommendation_type=RecommendationType.ALTITUDE_OPTIMIZATION,
+                priority="medium",
+                action_required="Request altitude change to FL380",
+                expected_fuel_savings=100.0,
+                expected_cost_savings=85.0,
+                time_impact=2,
+                confidence_level=0.8,
+                weather_considerations=[],
+                implementation_steps=[]
+            )
+            for i in range(25)
+        ]
+        
+        results = mcp.publish_many(recommendations)
+        
+        assert len(results) == 25
+        assert all(r["status"] == "published" for r in results)
+        assert [h["flight_id"] for h in mcp.get_message_history()] == [
+            r.flight_id for r in recommendations
+        ]
+        
+        single = mcp.publish_to_operations(recommendations[0])
+        assert single.keys() == results[0].keys()
+        assert mcp.get_message_history()[-1].keys() == mcp.get_message_history()[0].keys()
+    
+    def test_priority_case_insensitive(self):
+        """Test externally supplied priorities map regardless of case"""
+        mcp = MCPIntegration()
+        recommendation = OptimizationRecommendation(
+            flight_id="TEST001",
+            recommendation_type=RecommendationType.ALTITUDE_OPTIMIZATION,
+            priority="HIGH",
+            action_required="Request altitude change to FL380",
+            expected_fuel_savings=100.0,
+            expected_cost_savings=85.0,
+            time_impact=2,
+            confidence_level=0.8,
+            weather_considerations=[],
+            implementation_steps=[]
+        )
+        
+        assert recommendation.priority == "high"
+        assert mcp._build_message(recommendation, datetime.now(timezone.utc)).priority == 9
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
+
+
+class TestLambdaHandlers:
+    """Test Step Functions state handlers"""
+    
+    def test_compute_uses_supplied_weather(self):
+        """Test the compute step optimizes with the map's weather instead of refetching"""
+        event = lambda_handler.data_ingestion_handler(lambda_handler._WARMUP_EVENT, None)["data"]
+        weather = {
+            "location": "JFK",
+            "timestamp": "2025-01-01T00:00:00Z",
+            "temperature": -50.0,
+            "wind_speed": 140,
+            "wind_direction": 270,
+            "visibility": 10.0,
+            "conditions": "Clear"
+        }
+        event["weather_data"] = [weather, None, dict(weather, location="LAX")]
+        
+        result = lambda_handler.optimization_compute_handler(event, None)["result"]
+        
+        assert "Strong winds averaging 140 knots" in result["weather_factors"]
+
+
+class TestBatchRunner:
+    """Test the batch optimization runner"""
+    
+    def test_bad_flights_do_not_abort_batch(self, tmp_path):
+        """Test failing flights are skipped and the rest are still optimized"""
+        data_dir = tmp_path / "data"
+        data_dir.mkdir()
+        (data_dir / "sample_flights.csv").write_text(
+            "flight_id,origin,destination,aircraft_type,departure_time,cruise_altitude,planned_fuel,passenger_count,cargo_weight\n"
+            "GOOD1,JFK,LAX,B737-800,2025-02-15T14:30:00,36000,15000,150,5000\n"
+            "BADPLAN,JFK,LAX,B737-800,2025-02-15T15:00:00,36000,15000,150,5000\n"
+            "BADWX,JFK,LAX,B737-800,2025-02-15T15:30:00,36000,15000,150,5000\n"
+        )
+        route = [
+            {"name": "JFK", "latitude": 40.64, "longitude": -73.78},
+            {"name": "LAX", "latitude": 33.94, "longitude": -118.41}
+        ]
+        (data_dir / "route_waypoints.json").write_text(json.dumps({
+            "GOOD1": {"route": route},
+            "BADPLAN": {"route": [{"name": "JFK", "latitude": 95.0, "longitude": -73.78}]},
+            "BADWX": {"route": [{"name": "NOWX", "latitude": 40.0, "longitude": -80.0}] + route}
+        }))
+        
+        agent = FuelOptimizationAgent(data_dir=str(data_dir))
+        fetch = agent.weather_service.fetch_weather_for_route
+        
+        def failing_fetch(waypoints):
+            if waypoints and waypoints[0].name == "NOWX":
+                raise RuntimeError("weather unavailable")
+            return fetch(waypoints)
+        
+        agent.weather_service.fetch_weather_for_route = failing_fetch
+        
+        report = agent.run_batch_optimization()
+        
+        assert [f["flight_id"] for f in report["flights"]] == ["GOOD1"]
+        assert report["flights"][0]["publication"]["status"] == "published"